@@ -0,0 +1,252 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any, Callable, Iterator, NamedTuple
+import numpy as np
+from n9010a_controller.peaks import _filter_excursion, _local_maxima
+
+
+Channel = tuple[float, float]
+
+
+class OccupiedBandwidth(NamedTuple):
+    bandwidth: float
+    low: float
+    high: float
+
+
+def _power_mw(ampl: np.ndarray) -> np.ndarray:
+    return np.power(10, np.asarray(ampl, dtype=np.float64) / 10)
+
+
+def _bin_width(freq: np.ndarray) -> float:
+    return float(freq[-1] - freq[0]) / (len(freq) - 1) if len(freq) > 1 else 0
+
+
+def channel_power(freq: np.ndarray, ampl: np.ndarray, rbw: float) -> float:
+    """Integrated power of the trace in dBm. Every bin measures power in
+    the RBW, so the sum is scaled by bin width / RBW."""
+    if not len(ampl):
+        return -np.inf
+    scale: float = _bin_width(freq) / rbw if len(freq) > 1 else 1
+    return float(10 * np.log10(_power_mw(ampl).sum() * scale))
+
+
+def occupied_bandwidth(freq: np.ndarray, ampl: np.ndarray,
+                       percent: float = 99) -> OccupiedBandwidth:
+    """Bandwidth containing `percent` of the trace power, with equal power
+    left outside on both sides."""
+    if not len(ampl):
+        return OccupiedBandwidth(0, 0, 0)
+    cumulative: np.ndarray = np.cumsum(_power_mw(ampl))
+    outside: float = cumulative[-1] * (1 - percent / 100) / 2
+    low: int = int(np.searchsorted(cumulative, outside))
+    high: int = min(int(np.searchsorted(cumulative, cumulative[-1] - outside)),
+                    len(freq) - 1)
+    return OccupiedBandwidth(float(freq[high] - freq[low]), float(freq[low]),
+                             float(freq[high]))
+
+
+def noise_floor(freq: np.ndarray, ampl: np.ndarray, window: int = 1001,
+                percentile: float = 50) -> tuple[np.ndarray, np.ndarray]:
+    """Noise floor profile: `percentile` of amplitude in consecutive windows
+    of `window` bins. Emissions occupying less than half of a window don't
+    affect the median. Leftover bins make the last, shorter window.
+    Returns window center frequencies and levels."""
+    freq, ampl = np.asarray(freq), np.asarray(ampl)
+    size: int = len(ampl) // window * window
+    levels: np.ndarray = np.percentile(ampl[:size].reshape(-1, window), percentile, axis=1)
+    centers: np.ndarray = freq[:size].reshape(-1, window).mean(axis=1)
+    if size < len(ampl):
+        levels = np.append(levels, np.percentile(ampl[size:], percentile))
+        centers = np.append(centers, freq[size:].mean())
+    return centers, levels
+
+
+def spurs(freq: np.ndarray, ampl: np.ndarray, margin: float = 10,
+          excursion: float = 6, window: int = 1001) -> np.ndarray:
+    """Emissions exceeding the local noise floor by `margin` dB. Returns
+    (N, 2) array of (amplitude, frequency) pairs like `find_peaks`."""
+    if len(ampl) < 3:
+        return np.empty((0, 2))
+    centers, levels = noise_floor(freq, ampl, window)
+    excess: np.ndarray = np.asarray(ampl, dtype=np.float64) - np.interp(freq, centers, levels)
+    indexes: np.ndarray = _local_maxima(excess, margin, 1 << 20)
+    indexes = _filter_excursion(np.asarray(ampl), indexes, excursion)
+    return np.column_stack((np.asarray(ampl[indexes], dtype=np.float64),
+                            np.asarray(freq[indexes], dtype=np.float64)))
+
+
+KERNELS: dict[str, Callable[..., Any]] = {
+    'channel_power': channel_power,
+    'occupied_bandwidth': occupied_bandwidth,
+    'noise_floor': noise_floor,
+    'spurs': spurs,
+}
+
+# How a worker finds the trace: shared memory block or memory mapped file,
+# dtype descr, item count and byte offset.
+TraceHandle = tuple[str, str, list, int, int]
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attaches to the block created by the parent. Pool workers share the
+    parent resource tracker under every start method, so before Python 3.13
+    (no `track` argument) the duplicate registration is harmless, while
+    unregistering it would drop the parent's one."""
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # type: ignore
+    except TypeError:
+        return shared_memory.SharedMemory(name)
+
+
+def _run_kernel(kernel: str, handle: TraceHandle, start: int, stop: int,
+                kwargs: dict[str, Any]) -> Any:
+    """Worker entry point: maps the trace without copying and runs the
+    kernel on `[start:stop]` bins."""
+    kind, name, descr, count, offset = handle
+    dtype = np.dtype([tuple(field) for field in descr])
+    shm: shared_memory.SharedMemory | None = None
+    if kind == 'shm':
+        shm = _attach(name)
+        trace = np.ndarray((count,), dtype=dtype, buffer=shm.buf)
+    else:
+        trace = np.memmap(name, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    part: np.ndarray = trace[start:stop]
+    try:
+        return KERNELS[kernel](part['freq'], part['ampl'], **kwargs)
+    finally:
+        del part, trace
+        if shm is not None:
+            shm.close()
+
+
+class SharedTrace:
+    """Makes a trace available to worker processes. Whole memory mapped
+    traces (stitched scans saved by `TraceWriter`) are opened by workers
+    from the same file, other traces are copied once into shared memory."""
+    def __init__(self, trace: np.ndarray) -> None:
+        self.trace: np.ndarray = trace
+        self._shm: shared_memory.SharedMemory | None = None
+        descr: list = trace.dtype.descr
+        if isinstance(trace, np.memmap) and trace.filename is not None \
+                and os.path.getsize(trace.filename) - trace.offset == trace.nbytes:
+            self.handle: TraceHandle = ('file', str(trace.filename), descr,
+                                        len(trace), trace.offset)
+        else:
+            self._shm = shared_memory.SharedMemory(create=True,
+                                                   size=max(trace.nbytes, 1))
+            np.ndarray(trace.shape, dtype=trace.dtype, buffer=self._shm.buf)[:] = trace
+            self.handle = ('shm', self._shm.name, descr, len(trace), 0)
+
+    def __enter__(self) -> 'SharedTrace':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+@contextmanager
+def _shared(trace: 'np.ndarray | SharedTrace') -> Iterator[SharedTrace]:
+    """Shares the trace for one call, `SharedTrace` given by the caller is
+    reused and left open."""
+    if isinstance(trace, SharedTrace):
+        yield trace
+        return
+    with SharedTrace(trace) as shared:
+        yield shared
+
+
+class TraceAnalyzer:
+    """Runs analysis kernels on (freq, ampl) traces in a process pool, so
+    the qasync event loop isn't blocked. Independent channels and trace
+    segments are dispatched as separate jobs, the trace is shared with
+    workers instead of being pickled for every job. Methods accept a trace
+    or `SharedTrace`, the latter lets several analyses share one copy."""
+    def __init__(self, max_workers: int | None = None) -> None:
+        self.max_workers: int = max_workers or os.cpu_count() or 1
+        self._pool: ProcessPoolExecutor | None = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.max_workers)
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _map(self, kernel: str, shared: SharedTrace,
+                   ranges: list[tuple[int, int]], kwargs: list[dict[str, Any]]) -> list[Any]:
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(self.pool, _run_kernel, kernel, shared.handle,
+                                 start, stop, params)
+            for (start, stop), params in zip(ranges, kwargs)
+        ])
+
+    @staticmethod
+    def _channel_ranges(trace: np.ndarray,
+                        channels: list[Channel]) -> list[tuple[int, int]]:
+        freq: np.ndarray = trace['freq']
+        return [(int(np.searchsorted(freq, center - width / 2)),
+                 int(np.searchsorted(freq, center + width / 2, 'right')))
+                for center, width in channels]
+
+    def _segment_ranges(self, size: int, overlap: int = 0) -> list[tuple[int, int]]:
+        bounds: np.ndarray = np.linspace(0, size, self.max_workers + 1).astype(int)
+        return [(max(start - overlap, 0), min(stop + overlap, size))
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    async def channel_powers(self, trace: np.ndarray | SharedTrace,
+                             channels: list[Channel], rbw: float) -> list[float]:
+        """Power in dBm of every (center, bandwidth) channel."""
+        with _shared(trace) as shared:
+            return await self._map('channel_power', shared,
+                                   self._channel_ranges(shared.trace, channels),
+                                   [{'rbw': rbw}] * len(channels))
+
+    async def occupied_bandwidths(self, trace: np.ndarray | SharedTrace,
+                                  channels: list[Channel],
+                                  percent: float = 99) -> list[OccupiedBandwidth]:
+        with _shared(trace) as shared:
+            return await self._map('occupied_bandwidth', shared,
+                                   self._channel_ranges(shared.trace, channels),
+                                   [{'percent': percent}] * len(channels))
+
+    async def noise_floor(self, trace: np.ndarray | SharedTrace, window: int = 1001,
+                          percentile: float = 50) -> tuple[np.ndarray, np.ndarray]:
+        """Noise floor profile of the whole trace computed by segments."""
+        with _shared(trace) as shared:
+            ranges: list[tuple[int, int]] = self._segment_ranges(len(shared.trace))
+            parts = await self._map('noise_floor', shared, ranges,
+                                    [{'window': window, 'percentile': percentile}]
+                                    * len(ranges))
+        return (np.concatenate([centers for centers, _ in parts]),
+                np.concatenate([levels for _, levels in parts]))
+
+    async def spurs(self, trace: np.ndarray | SharedTrace, margin: float = 10,
+                    excursion: float = 6, window: int = 1001) -> np.ndarray:
+        """Spurious emissions of the whole trace sorted by amplitude.
+        Segments overlap by one window, so emissions on segment edges are
+        found and deduplicated by frequency."""
+        with _shared(trace) as shared:
+            ranges: list[tuple[int, int]] = self._segment_ranges(len(shared.trace),
+                                                                 window)
+            parts = await self._map('spurs', shared, ranges,
+                                    [{'margin': margin, 'excursion': excursion,
+                                      'window': window}] * len(ranges))
+        result: np.ndarray = np.concatenate(parts) if parts else np.empty((0, 2))
+        _, unique = np.unique(result[:, 1], return_index=True)
+        result = result[unique]
+        return result[np.argsort(-result[:, 0], kind='stable')]
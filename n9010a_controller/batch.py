@@ -0,0 +1,53 @@
+class CommandBatch:
+    """Joins several SCPI commands built by `N9010A_API` into one program
+    message separated with `;`, so they are sent by a single write. Queries
+    in the batch are answered by the instrument with one response message
+    which is split back by `split_answer`. Queries returning binary blocks
+    (`:READ:SAN?`, `:MMEM:DATA?`) must not be batched."""
+    def __init__(self, *commands: bytes) -> None:
+        self.commands: list[bytes] = []
+        self.queries_amount: int = 0
+        for cmd in commands:
+            self.add(cmd)
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def add(self, cmd: bytes) -> 'CommandBatch':
+        cmd = cmd.strip()
+        if not cmd.startswith((b':', b'*')):
+            cmd = b':' + cmd
+        if b'?' in cmd.split(b' ', 1)[0]:
+            self.queries_amount += 1
+        self.commands.append(cmd)
+        return self
+
+    def extend(self, commands: list[bytes]) -> 'CommandBatch':
+        for cmd in commands:
+            self.add(cmd)
+        return self
+
+    def encode(self) -> bytes:
+        return b';'.join(self.commands) + b'\n'
+
+    def split_answer(self, answer: bytes) -> list[bytes]:
+        """Splits compound response on batched queries. Semicolons inside
+        quoted strings are kept."""
+        answer = answer.strip()
+        if b'"' not in answer:
+            parts: list[bytes] = answer.split(b';')
+        else:
+            parts = []
+            start: int = 0
+            quoted: bool = False
+            for i, char in enumerate(answer):
+                if char == ord('"'):
+                    quoted = not quoted
+                elif char == ord(';') and not quoted:
+                    parts.append(answer[start:i])
+                    start = i + 1
+            parts.append(answer[start:])
+        if len(parts) != self.queries_amount:
+            raise ValueError(f'Expected {self.queries_amount} answers, '
+                             f'got {len(parts)}: {answer[:64]!r}')
+        return parts
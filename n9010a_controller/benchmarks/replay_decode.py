@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from n9010a_controller.session import N9010ASession
+from n9010a_controller.simulator import SimulatedN9010A
+
+
+async def workload(session: N9010ASession, points: int,
+                   segments: int) -> list[np.ndarray]:
+    """Sweeps, peaks and stitch, results are compared between recording
+    and replays."""
+    await session.configure(points=points)
+    results: list[np.ndarray] = [await session.sweep(), await session.peaks(-60, 3)]
+    step: int = 10_000_000
+    results.append(np.array(await session.stitch(int(1e9), int(1e9) + segments * step,
+                                                 step, points=points)))
+    return results
+
+
+async def record(path: Path, points: int, segments: int) -> list[np.ndarray]:
+    simulator = SimulatedN9010A()
+    port: int = await simulator.start()
+    try:
+        async with N9010ASession('127.0.0.1', port) as session:
+            session.start_recording(path)
+            try:
+                return await workload(session, points, segments)
+            finally:
+                session.stop_recording()
+    finally:
+        await simulator.stop()
+
+
+async def replay(path: Path, points: int, segments: int,
+                 realtime: bool) -> tuple[float, list[np.ndarray]]:
+    session = N9010ASession.replay(path, realtime)
+    await session.connect()
+    started: float = time.perf_counter()
+    results: list[np.ndarray] = await workload(session, points, segments)
+    elapsed: float = time.perf_counter() - started
+    mismatches = session.device.mismatches  # type: ignore
+    if mismatches:
+        print(f'{len(mismatches)} messages differ from the log, '
+              f'first: {mismatches[0]}')
+    await session.disconnect()
+    return elapsed, results
+
+
+async def run(log: Path | None, points: int, segments: int, repeat: int,
+              realtime: bool) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        expected: list[np.ndarray] | None = None
+        if log is None:
+            log = Path(folder) / 'session.scpilog'
+            expected = await record(log, points, segments)
+        print(f'log: {log.stat().st_size / 1e6:.2f} MB')
+        durations: list[float] = []
+        for _ in range(repeat):
+            elapsed, results = await replay(log, points, segments, realtime)
+            durations.append(elapsed)
+            if expected is not None and not all(
+                    np.array_equal(a, b) for a, b in zip(expected, results)):
+                raise AssertionError('Replayed results differ from recorded ones')
+        values = np.array(durations)
+        print(f'replay: median {np.median(values) * 1e3:8.3f} ms, '
+              f'min {values.min() * 1e3:8.3f} ms over {repeat} runs')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Decode path regression '
+                                     'benchmark on recorded SCPI traffic')
+    parser.add_argument('--log', type=Path, default=None,
+                        help='log recorded with the same workload, by default '
+                             'it is recorded against simulated N9010A')
+    parser.add_argument('--points', type=int, default=40001)
+    parser.add_argument('--segments', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--realtime', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(run(args.log, args.points, args.segments, args.repeat,
+                    args.realtime))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+from ast import literal_eval
+import timeit
+import numpy as np
+from n9010a_controller.scpi_parser import parse_peak_list, parse_scalar
+
+
+def literal_eval_peaks(data: bytes) -> list[tuple[float, float]]:
+    """Previous `N9010A_API.parse_measured_data` implementation."""
+    elements: list[str] = data.decode().split(',')
+    peaks_amount: int = literal_eval(elements[0])
+    if peaks_amount > 0:
+        values: list[float] = [literal_eval(el) for el in elements[1:]]
+        return [tuple(values[i: i + 2]) for i in range(0, len(values), 2)]  # type: ignore
+    return []
+
+
+def make_peak_answer(peaks_amount: int) -> bytes:
+    rng = np.random.default_rng(0)
+    freq = np.sort(rng.uniform(1e9, 6e9, peaks_amount))
+    ampl = rng.uniform(-90, 0, peaks_amount)
+    pairs = ','.join(f'{f:.8e},{a:.6e}' for f, a in zip(freq, ampl))
+    return f'{peaks_amount:.4e},{pairs}\n'.encode('ascii')
+
+
+def main(repeat: int = 5) -> None:
+    for peaks_amount in (10, 1000, 100000):
+        answer: bytes = make_peak_answer(peaks_amount)
+        for name, func in (('literal_eval', literal_eval_peaks),
+                           ('parse_peak_list', parse_peak_list)):
+            best: float = min(timeit.repeat(lambda: func(answer),
+                                            number=1, repeat=repeat))
+            print(f'{name:>16}: {best * 1e3:9.3f} ms per {peaks_amount} peaks')
+    scalar: bytes = b'+1.00000000E+009'
+    number: int = 100000
+    for name, func in (('literal_eval', lambda: literal_eval(scalar.decode())),
+                       ('parse_scalar', lambda: parse_scalar(scalar))):
+        best = min(timeit.repeat(func, number=number, repeat=repeat))
+        print(f'{name:>16}: {best / number * 1e6:9.3f} us per scalar')
+
+
+if __name__ == '__main__':
+    main()
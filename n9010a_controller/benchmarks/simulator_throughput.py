@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import time
+import numpy as np
+from n9010a_controller.session import N9010ASession
+from n9010a_controller.simulator import SimulatedN9010A
+
+
+def report(name: str, durations: list[float], count: int = 1,
+           size: int = 0) -> None:
+    values = np.array(durations)
+    line: str = (f'{name:>10}: median {np.median(values) * 1e3:8.3f} ms, '
+                 f'p95 {np.percentile(values, 95) * 1e3:8.3f} ms, '
+                 f'{count / values.mean():9.1f} /s')
+    if size:
+        line += f', {size / values.mean() / 1e6:8.2f} MB/s'
+    print(line)
+
+
+async def measure(repeat: int, func) -> list[float]:
+    durations: list[float] = []
+    for _ in range(repeat):
+        started: float = time.perf_counter()
+        await func()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+async def run(points: int, repeat: int, latency: float,
+              bandwidth: float, segments: int) -> None:
+    simulator = SimulatedN9010A(latency=latency, bandwidth=bandwidth)
+    port: int = await simulator.start()
+    async with N9010ASession('127.0.0.1', port) as session:
+        await session.configure(points=points)
+        api = session.api
+        report('command', await measure(repeat, lambda: session.query(api.get_res_bandwidth())))
+        trace_size: int = points * 8 + 16
+        report('sweep', await measure(repeat, session.sweep), size=trace_size)
+        report('peaks', await measure(repeat, lambda: session.peaks(-60, 3)))
+        step: int = 10_000_000
+        stitch = lambda: session.stitch(int(1e9), int(1e9) + segments * step, step,
+                                        points=points)
+        report('stitch', await measure(max(repeat // 10, 1), stitch),
+               count=segments, size=segments * trace_size)
+    await simulator.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Sweep, stitch and peak '
+                                     'throughput against simulated N9010A')
+    parser.add_argument('--points', type=int, default=40001)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--bandwidth', type=float, default=0)
+    parser.add_argument('--segments', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.points, args.repeat, args.latency,
+                    args.bandwidth, args.segments))
+
+
+if __name__ == '__main__':
+    main()
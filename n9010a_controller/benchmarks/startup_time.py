@@ -0,0 +1,72 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+MODULE: str = 'n9010a_controller.pyqt_client.backend'
+WINDOW_SNIPPET: str = (
+    'from PyQt6 import QtWidgets\n'
+    'app = QtWidgets.QApplication([])\n'
+    f'from {MODULE} import N9010A_Controller\n'
+    'N9010A_Controller()\n'
+)
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Parses `-X importtime` report lines
+    `import time: self [us] | cumulative | imported package` into
+    (module, self us, cumulative us) tuples."""
+    result: list[tuple[str, int, int]] = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        result.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return result
+
+
+def measure_imports(module: str = MODULE) -> list[tuple[str, int, int]]:
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           f'import {module}'],
+                          capture_output=True, text=True, check=True)
+    return parse_importtime(proc.stderr)
+
+
+def measure_window() -> float:
+    """Seconds from interpreter start to constructed main window."""
+    env: dict[str, str] = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    started: float = time.perf_counter()
+    subprocess.run([sys.executable, '-c', WINDOW_SNIPPET], env=env, check=True)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Cold start time of the GUI')
+    parser.add_argument('--budget', type=float, default=1.5,
+                        help='max import time of the GUI module, s')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--window', action='store_true',
+                        help='also measure main window construction')
+    args = parser.parse_args()
+    imports = measure_imports()
+    top_level = [(name, cumulative) for name, _, cumulative in imports
+                 if not name.startswith(' ')]
+    total: float = sum(cumulative for _, cumulative in top_level) / 1e6
+    print(f'{"module":<48} {"cumulative, ms":>14}')
+    for name, cumulative in sorted(top_level, key=lambda x: -x[1])[:args.top]:
+        print(f'{name:<48} {cumulative / 1e3:14.1f}')
+    print(f'import {MODULE}: {total:.3f} s (budget {args.budget:.3f} s)')
+    heavy: list[str] = [name.strip() for name, _, _ in imports
+                        if name.strip() in ('matplotlib', 'matplotlib.pyplot')]
+    if heavy:
+        print(f'eagerly imported: {", ".join(heavy)}')
+    if args.window:
+        print(f'window constructed in {measure_window():.3f} s')
+    if total > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import struct
+import timeit
+import numpy as np
+from n9010a_controller.trace_decoder import decode_trace
+
+
+def struct_decode(payload: bytes) -> np.ndarray:
+    """Previous `_single_sweep` decoding path."""
+    return np.array([struct.unpack('>f', payload[i:i + 4])[0]
+                     for i in range(0, len(payload), 4)
+                     if len(payload[i:i + 4]) == 4])
+
+
+def make_payload(points: int) -> bytes:
+    freq = np.linspace(1e9, 2e9, points)
+    ampl = np.random.default_rng(0).uniform(-100, 0, points)
+    return np.column_stack((freq, ampl)).astype('>f4').tobytes()
+
+
+def main(points: int = 40001, repeat: int = 5) -> None:
+    payload: bytes = make_payload(points)
+    assert np.array_equal(struct_decode(payload).astype(np.float32),
+                          decode_trace(payload).view('>f4').astype(np.float32))
+    for name, func in (('struct.unpack', struct_decode),
+                       ('np.frombuffer', decode_trace)):
+        best: float = min(timeit.repeat(lambda: func(payload),
+                                        number=1, repeat=repeat))
+        print(f'{name:>14}: {best * 1e3:9.3f} ms per {points} points sweep')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+import numpy as np
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray,
+                    bins: int) -> tuple[np.ndarray, np.ndarray]:
+    """Reduces (x, y) line to at most `2 * bins` points keeping minimum and
+    maximum of every bin in their original order, so narrow peaks survive
+    decimation to screen width."""
+    size: int = len(y)
+    if bins <= 0 or size <= 2 * bins:
+        return x, y
+    per_bin: int = size // bins
+    used: int = per_bin * bins
+    blocks: np.ndarray = y[:used].reshape((bins, per_bin))
+    offsets: np.ndarray = np.arange(0, used, per_bin)
+    arg_min: np.ndarray = blocks.argmin(axis=1) + offsets
+    arg_max: np.ndarray = blocks.argmax(axis=1) + offsets
+    indexes: np.ndarray = np.column_stack((np.minimum(arg_min, arg_max),
+                                           np.maximum(arg_min, arg_max))).ravel()
+    if used < size:
+        tail: np.ndarray = y[used:]
+        tail_indexes = np.sort([used + tail.argmin(), used + tail.argmax()])
+        indexes = np.concatenate((indexes, tail_indexes))
+    return x[indexes], y[indexes]
@@ -0,0 +1,101 @@
+import asyncio
+import fnmatch
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+from n9010a_controller.scpi_parser import Catalog, CatalogEntry, parse_catalog
+
+if TYPE_CHECKING:
+    from n9010a_controller.session import N9010ASession
+
+
+TransferProgress = Callable[[int, int, str], None]
+
+
+def remote_join(directory: str, name: str) -> str:
+    """Joins instrument (Windows) path parts."""
+    if not directory:
+        return name
+    return directory.rstrip('\\/') + '\\' + name
+
+
+class FileTransfer:
+    """Downloads files from the analyzer mass storage by `:MMEM:DATA?`.
+    Block replies are copied to disk by chunks as they arrive. Batch
+    downloads keep `in_flight` queries pipelined on the command channel,
+    so the instrument doesn't idle between files. Files are written to
+    `.part` and renamed when complete; `:MMEM:DATA?` has no offset, so
+    interrupted files are downloaded again, while files with the same size
+    on disk are skipped."""
+    def __init__(self, session: 'N9010ASession', in_flight: int = 4,
+                 timeout: float = 120) -> None:
+        self.session: 'N9010ASession' = session
+        self.in_flight: int = in_flight
+        self.timeout: float = timeout
+
+    async def catalog(self, directory: str) -> Catalog:
+        api = self.session.api
+        return parse_catalog(await self.session.query(
+            api.read_mass_storage_catalog(f'"{directory}"')))
+
+    async def download(self, remote: str, local: Path | str,
+                       size: int | None = None,
+                       skip_same_size: bool = True) -> bool:
+        """Downloads one file. Returns False if it was skipped because the
+        local file has the same `size` (as listed in the catalog)."""
+        local = Path(local)
+        if skip_same_size and size is not None and local.exists() \
+                and local.stat().st_size == size:
+            return False
+        local.parent.mkdir(parents=True, exist_ok=True)
+        part: Path = local.with_name(local.name + '.part')
+        try:
+            with open(part, 'wb') as file:
+                # Timeout covers the wait for the block header and stalls
+                # between chunks, large files stream as long as data keeps
+                # coming. Failed local writes fail the request.
+                request = await self.session.channel.send(
+                    self.session.api.read_file(remote), 'block', file, self.timeout)
+                await self.session.channel.wait(request)
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        part.replace(local)
+        return True
+
+    async def download_dir(self, directory: str, local_dir: Path | str,
+                           pattern: str = '*', skip_same_size: bool = True,
+                           progress: TransferProgress | None = None) -> list[Path]:
+        """Downloads files of the instrument directory matching `pattern`.
+        `progress` is called with done files, total files and file name.
+        Returns paths of downloaded (not skipped) files."""
+        local_dir = Path(local_dir)
+        entries: list[CatalogEntry] = [
+            entry for entry in (await self.catalog(directory)).entries
+            if not entry.is_dir and fnmatch.fnmatch(entry.name.lower(), pattern.lower())
+        ]
+        slots = asyncio.Semaphore(self.in_flight)
+        done: int = 0
+
+        async def fetch(entry: CatalogEntry) -> Path | None:
+            nonlocal done
+            async with slots:
+                local: Path = local_dir / entry.name
+                loaded: bool = await self.download(remote_join(directory, entry.name),
+                                                   local, entry.size, skip_same_size)
+            done += 1
+            if progress:
+                progress(done, len(entries), entry.name)
+            return local if loaded else None
+
+        results = await asyncio.gather(*[fetch(entry) for entry in entries])
+        return [path for path in results if path is not None]
+
+    async def screenshot(self, name: str, local_dir: Path | str) -> Path:
+        """Saves the screen to `<name>.png` on the instrument, waits until
+        the file is written and downloads it."""
+        api = self.session.api
+        await self.session.send(api.save_screenshot(name))
+        await self.session.query(api.operation_complete_query())
+        local: Path = Path(local_dir) / (Path(name.replace('\\', '/')).name + '.png')
+        await self.download(f'{name}.png', local, skip_same_size=False)
+        return local
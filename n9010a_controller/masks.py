@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Literal, NamedTuple
+import numpy as np
+
+
+MaskKind = Literal['upper', 'lower']
+
+
+class LimitMask(NamedTuple):
+    """Piecewise-linear limit in dBm given by (freq, level) vertices.
+    Bins outside the first and last vertex are not tested. Vertical steps
+    are made by two vertices with the same frequency."""
+    freq: np.ndarray
+    level: np.ndarray
+    kind: MaskKind = 'upper'
+    name: str = ''
+
+    @classmethod
+    def from_points(cls, points: list[tuple[float, float]],
+                    kind: MaskKind = 'upper', name: str = '') -> 'LimitMask':
+        vertices: np.ndarray = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(vertices) < 2 or np.any(np.diff(vertices[:, 0]) < 0):
+            raise ValueError('Mask needs at least two vertices in frequency order')
+        return cls(vertices[:, 0], vertices[:, 1], kind, name)
+
+    @classmethod
+    def from_csv(cls, path: Path | str, kind: MaskKind = 'upper') -> 'LimitMask':
+        """Reads `freq;level` lines like `export_csv` writes."""
+        vertices: np.ndarray = np.loadtxt(path, delimiter=';', ndmin=2)
+        return cls.from_points(vertices.tolist(), kind, Path(path).stem)
+
+    def compile(self, freq: np.ndarray) -> np.ndarray:
+        """Limit on the frequency grid, NaN outside of the mask."""
+        limit: np.ndarray = np.interp(freq, self.freq, self.level).astype(np.float32)
+        limit[(freq < self.freq[0]) | (freq > self.freq[-1])] = np.nan
+        return limit
+
+
+class MaskResult(NamedTuple):
+    """Per trace results. `worst_freq` and `worst_margin` hold the most
+    offending bins sorted from the worst, margin is negative on failure."""
+    passed: np.ndarray
+    margin: np.ndarray
+    violations: np.ndarray
+    worst_freq: np.ndarray
+    worst_margin: np.ndarray
+
+
+class MaskEngine:
+    """Pass/fail testing of traces against a set of upper and lower masks.
+    Masks are compiled once per frequency grid to the tightest upper and
+    lower limit arrays (a few grids are cached), then any number of traces
+    on the grid is evaluated by one numpy broadcast."""
+    def __init__(self, masks: list[LimitMask], cache_size: int = 4) -> None:
+        self.masks: list[LimitMask] = masks
+        self.cache_size: int = cache_size
+        self._cache: OrderedDict[tuple, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+
+    @staticmethod
+    def _grid_key(freq: np.ndarray) -> tuple:
+        """Grid identity from its size and a strided sample, so long
+        stitched grids aren't hashed whole."""
+        sample: np.ndarray = np.asarray(freq[::max(len(freq) // 64, 1)], dtype=np.float64)
+        return len(freq), float(freq[-1]), sample.tobytes()
+
+    def compile(self, freq: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns upper and lower limits (NaN where not limited)."""
+        key: tuple = self._grid_key(freq)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        freq = np.asarray(freq, dtype=np.float64)
+        upper: np.ndarray = np.full(len(freq), np.nan, dtype=np.float32)
+        lower: np.ndarray = np.full(len(freq), np.nan, dtype=np.float32)
+        for mask in self.masks:
+            if mask.kind == 'upper':
+                np.fmin(upper, mask.compile(freq), out=upper)
+            else:
+                np.fmax(lower, mask.compile(freq), out=lower)
+        self._cache[key] = (upper, lower)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return upper, lower
+
+    def margins(self, traces: np.ndarray) -> np.ndarray:
+        """(..., points) margins in dB of structured traces on one grid,
+        e.g. a stitched scan or `TraceRingBuffer.history()`. Positive
+        values pass, NaN bins aren't limited."""
+        freq: np.ndarray = traces['freq'].reshape(-1, traces.shape[-1])[0]
+        upper, lower = self.compile(freq)
+        ampl: np.ndarray = np.asarray(traces['ampl'], dtype=np.float32)
+        with np.errstate(invalid='ignore'):
+            return np.fmin(upper - ampl, ampl - lower)
+
+    def evaluate(self, traces: np.ndarray, worst: int = 10) -> MaskResult:
+        """Evaluates one trace or (traces, points) array. Results have
+        one row per trace."""
+        margin: np.ndarray = self.margins(traces).reshape(-1, traces.shape[-1])
+        freq: np.ndarray = traces['freq'].reshape(-1, traces.shape[-1])[0]
+        checked: np.ndarray = np.where(np.isnan(margin), np.inf, margin)
+        worst = min(worst, checked.shape[1])
+        indexes: np.ndarray = np.argpartition(checked, worst - 1, axis=1)[:, :worst] \
+            if worst else np.empty((len(checked), 0), dtype=np.intp)
+        worst_margin: np.ndarray = np.take_along_axis(checked, indexes, axis=1)
+        order: np.ndarray = np.argsort(worst_margin, axis=1, kind='stable')
+        indexes = np.take_along_axis(indexes, order, axis=1)
+        worst_margin = np.take_along_axis(worst_margin, order, axis=1)
+        limited: np.ndarray = np.isfinite(worst_margin)
+        min_margin: np.ndarray = checked.min(axis=1) if checked.shape[1] \
+            else np.full(len(checked), np.inf)
+        violations: np.ndarray = (checked < 0).sum(axis=1)
+        return MaskResult(passed=violations == 0, margin=min_margin,
+                          violations=violations,
+                          worst_freq=np.where(limited, freq[indexes], np.nan),
+                          worst_margin=np.where(limited, worst_margin, np.nan))
@@ -0,0 +1,156 @@
+import json
+from bisect import bisect_left
+from typing import Literal
+
+
+Phase = Literal['write', 'ttfb', 'transfer', 'decode']
+PHASES: tuple[Phase, ...] = ('write', 'ttfb', 'transfer', 'decode')
+# Upper bounds of histogram buckets in seconds: 10 us ... 100 s, 4 per decade.
+BUCKETS: tuple[float, ...] = tuple(round(10 ** (exp / 4), 12)
+                                   for exp in range(-20, 9))
+
+
+class LatencyHistogram:
+    """Fixed bucket histogram. Recording is one bisect and two additions,
+    quantiles are estimated by bucket upper bounds."""
+    def __init__(self, bounds: tuple[float, ...] = BUCKETS) -> None:
+        self.bounds: tuple[float, ...] = bounds
+        self.counts: list[int] = [0] * (len(bounds) + 1)
+        self.count: int = 0
+        self.sum: float = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0
+        rank: float = q * self.count
+        total: int = 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'sum': self.sum,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99)}
+
+
+class CommandStats:
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.errors: int = 0
+        self.bytes_out: int = 0
+        self.bytes_in: int = 0
+        self.phases: dict[Phase, LatencyHistogram] = {
+            phase: LatencyHistogram() for phase in PHASES
+        }
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'errors': self.errors,
+                'bytes_out': self.bytes_out, 'bytes_in': self.bytes_in,
+                **{phase: hist.to_dict() for phase, hist in self.phases.items()
+                   if hist.count}}
+
+
+class CommandMetrics:
+    """In-memory per-command metrics of the SCPI transport keyed by command
+    header (e.g. `:READ:SAN1?`). Phases are the write of the message, time
+    to the first reply byte, reply transfer and host side decoding."""
+    def __init__(self) -> None:
+        self.commands: dict[str, CommandStats] = {}
+
+    def _stats(self, header: str) -> CommandStats:
+        stats: CommandStats | None = self.commands.get(header)
+        if stats is None:
+            stats = self.commands[header] = CommandStats()
+        return stats
+
+    def clear(self) -> None:
+        self.commands.clear()
+
+    def record_write(self, header: str, size: int, seconds: float) -> None:
+        stats: CommandStats = self._stats(header)
+        stats.count += 1
+        stats.bytes_out += size
+        stats.phases['write'].observe(seconds)
+
+    def record_reply(self, header: str, size: int, ttfb: float,
+                     transfer: float) -> None:
+        stats: CommandStats = self._stats(header)
+        stats.bytes_in += size
+        stats.phases['ttfb'].observe(ttfb)
+        stats.phases['transfer'].observe(transfer)
+
+    def record_decode(self, header: str, seconds: float) -> None:
+        self._stats(header).phases['decode'].observe(seconds)
+
+    def record_error(self, header: str) -> None:
+        self._stats(header).errors += 1
+
+    def to_dict(self) -> dict:
+        return {header: stats.to_dict() for header, stats in self.commands.items()}
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix: str = 'n9010a') -> str:
+        """Returns metrics in Prometheus text exposition format."""
+        lines: list[str] = [
+            f'# HELP {prefix}_command_seconds SCPI command latency by phase.',
+            f'# TYPE {prefix}_command_seconds histogram',
+        ]
+        for header, stats in self.commands.items():
+            command: str = header.replace('\\', '\\\\').replace('"', '\\"')
+            for phase, hist in stats.phases.items():
+                if not hist.count:
+                    continue
+                labels: str = f'command="{command}",phase="{phase}"'
+                total: int = 0
+                for bound, count in zip(hist.bounds, hist.counts):
+                    total += count
+                    lines.append(f'{prefix}_command_seconds_bucket'
+                                 f'{{{labels},le="{bound:g}"}} {total}')
+                lines.append(f'{prefix}_command_seconds_bucket'
+                             f'{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f'{prefix}_command_seconds_sum{{{labels}}} {hist.sum:.9g}')
+                lines.append(f'{prefix}_command_seconds_count{{{labels}}} {hist.count}')
+        for name, attr, kind in (('commands_total', 'count', 'counter'),
+                                 ('errors_total', 'errors', 'counter'),
+                                 ('bytes_out_total', 'bytes_out', 'counter'),
+                                 ('bytes_in_total', 'bytes_in', 'counter')):
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for header, stats in self.commands.items():
+                command = header.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{prefix}_{name}{{command="{command}"}} '
+                             f'{getattr(stats, attr)}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """Human readable table with median and 95th percentile in ms."""
+        rows: list[str] = [f'{"command":<24}{"count":>7}{"err":>5}'
+                           + ''.join(f'{phase + " p50/p95":>22}' for phase in PHASES)]
+        for header, stats in sorted(self.commands.items()):
+            cells: str = ''.join(
+                f'{stats.phases[phase].quantile(0.5) * 1e3:>11.3g}'
+                f'{stats.phases[phase].quantile(0.95) * 1e3:>11.3g}'
+                for phase in PHASES
+            )
+            rows.append(f'{header:<24}{stats.count:>7}{stats.errors:>5}{cells}')
+        return '\n'.join(rows)
+
+
+def message_header(message: bytes) -> str:
+    """Metrics key of the program message: header of its last query or of
+    its first command if there are no queries."""
+    commands: list[bytes] = [cmd.strip().split(b' ', 1)[0]
+                             for cmd in message.split(b';') if cmd.strip()]
+    if not commands:
+        return ''
+    queries: list[bytes] = [cmd for cmd in commands if cmd.endswith(b'?')]
+    return (queries[-1] if queries else commands[0]).decode('ascii', 'replace')
@@ -1,17 +1,12 @@
-from ast import literal_eval
 from typing import Literal
+from n9010a_controller.scpi_parser import parse_peak_list
 
 
 class N9010A_API:
 
     @staticmethod
     def parse_measured_data(data: bytes) -> list[tuple[float, float]]:
-        elements: list[str] = data.decode().split(',')
-        peaks_amount: int = literal_eval(elements[0])
-        if peaks_amount > 0:
-            values: list[float] = [literal_eval(el) for el in elements[1:]]
-            return [tuple(values[i: i + 2]) for i in range(0, len(values), 2)]  # type: ignore
-        return []
+        return [tuple(peak) for peak in parse_peak_list(data).tolist()]  # type: ignore
 
     @staticmethod
     def identification_query() -> bytes:
@@ -34,6 +29,33 @@ class N9010A_API:
         and trigger systems, and puts the measurement into an "idle" state."""
         return '*ABOR\n'.encode('ascii')
 
+    @staticmethod
+    def operation_complete() -> bytes:
+        """Sets bit 0 of the Standard Event Status Register when all pending
+        overlapped operations are completed."""
+        return '*OPC\n'.encode('ascii')
+
+    @staticmethod
+    def operation_complete_query() -> bytes:
+        """Returns 1 when all pending overlapped operations are completed."""
+        return '*OPC?\n'.encode('ascii')
+
+    @staticmethod
+    def event_status_register() -> bytes:
+        """Returns and clears the Standard Event Status Register."""
+        return '*ESR?\n'.encode('ascii')
+
+    @staticmethod
+    def clear_status() -> bytes:
+        """Clears the status byte, event registers and error queue."""
+        return '*CLS\n'.encode('ascii')
+
+    @staticmethod
+    def get_operation_status() -> bytes:
+        """Returns the Operation Status condition register. Bit 3 is set
+        while the instrument is sweeping."""
+        return ':STAT:OPER:COND?\n'.encode('ascii')
+
     @staticmethod
     def calculate_peaks(ch: int, threshold: int, excursion: int,
                         order: Literal['AMPL', 'FREQ', 'TIME'] = 'AMPL',
@@ -183,6 +205,27 @@ class N9010A_API:
     def read_san(num: int) -> bytes:
         return f":READ:SAN{num}?\n".encode('ascii')
 
+    @staticmethod
+    def fetch_san(num: int) -> bytes:
+        """Returns data of the last completed sweep without starting
+        a new one."""
+        return f":FETC:SAN{num}?\n".encode('ascii')
+
+    @staticmethod
+    def set_data_format(fmt: Literal['ASC', 'REAL,32', 'REAL,64', 'INT,32']) -> bytes:
+        """Sets the format of the trace data returned by `:READ` and `:FETC`
+        queries."""
+        return f":FORM {fmt}\n".encode('ascii')
+
+    @staticmethod
+    def get_data_format() -> bytes:
+        return ":FORM?\n".encode('ascii')
+
+    @staticmethod
+    def set_byte_order(order: Literal['NORM', 'SWAP']) -> bytes:
+        """Sets byte order of binary trace data, `NORM` is big endian."""
+        return f":FORM:BORD {order}\n".encode('ascii')
+
     @staticmethod
     def set_continuous_sweep(state: bool) -> bytes:
         return f":INIT:CONT {int(state)}\n".encode('ascii')
@@ -223,6 +266,10 @@ class N9010A_API:
     def set_averaging(val: bool) -> bytes:
         return f":AVER {int(val)}\n".encode('ascii')
 
+    @staticmethod
+    def get_averaging() -> bytes:
+        return ":AVER?\n".encode('ascii')
+
     @staticmethod
     def set_averaging_amount(val: int) -> bytes:
         return f":AVER:COUN {val}\n".encode('ascii')
@@ -235,6 +282,11 @@ class N9010A_API:
     def get_points_amount() -> bytes:
         return ":SWE:POIN?\n".encode('ascii')
 
+    @staticmethod
+    def get_sweep_time() -> bytes:
+        """Returns the time of one sweep in seconds."""
+        return ":SWE:TIME?\n".encode('ascii')
+
     @staticmethod
     def set_freq_span(val: int,
                       units: Literal['HZ', 'KHZ', 'MHZ', 'GHZ'] = 'HZ'):
@@ -279,6 +331,12 @@ class N9010A_API:
         the following format: <numeric_value>,<numeric_value>,{<file_entry>}"""
         return f":MMEM:CAT? {dir_name}\n".encode('ascii')
 
+    @staticmethod
+    def read_file(file_name: str) -> bytes:
+        """Reads the file from the instrument mass storage. Answer is
+        a definite length block with file contents."""
+        return f":MMEM:DATA? \"{file_name}\"\n".encode('ascii')
+
     @staticmethod
     def mkdir(dir_name: str) -> bytes:
         """Creates a new directory."""
@@ -0,0 +1,65 @@
+from typing import Literal
+import numpy as np
+
+
+def _local_maxima(ampl: np.ndarray, threshold: float,
+                  chunk: int) -> np.ndarray:
+    """Indexes of local maxima above threshold. The trace is processed by
+    chunks overlapping by one bin, so temporary masks don't exceed `chunk`
+    elements. The right neighbour may be equal to handle flat tops."""
+    found: list[np.ndarray] = []
+    for start in range(1, len(ampl) - 1, chunk):
+        stop: int = min(start + chunk, len(ampl) - 1)
+        center: np.ndarray = ampl[start:stop]
+        mask: np.ndarray = ((center > ampl[start - 1: stop - 1])
+                            & (center >= ampl[start + 1: stop + 1])
+                            & (center > threshold))
+        found.append(np.flatnonzero(mask) + start)
+    return np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+
+
+def _filter_excursion(ampl: np.ndarray, indexes: np.ndarray,
+                      excursion: float) -> np.ndarray:
+    """Drops peaks which don't rise by `excursion` above the valley towards
+    a higher (or equal) neighbour peak or towards trace edge. Repeated
+    until no peak is dropped, so shallow bumps merge into main peaks."""
+    while len(indexes):
+        peaks: np.ndarray = ampl[indexes]
+        bounds: np.ndarray = np.concatenate(([0], indexes, [len(ampl) - 1]))
+        valleys: np.ndarray = np.minimum.reduceat(ampl, bounds[:-1])
+        left_valley: np.ndarray = valleys[:-1]
+        right_valley: np.ndarray = valleys[1:]
+        left_peak: np.ndarray = np.concatenate(([np.inf], peaks[:-1]))
+        right_peak: np.ndarray = np.concatenate((peaks[1:], [np.inf]))
+        dominated: np.ndarray = (((peaks - left_valley < excursion) & (left_peak >= peaks))
+                                 | ((peaks - right_valley < excursion) & (right_peak >= peaks)))
+        if not dominated.any():
+            break
+        indexes = indexes[~dominated]
+    return indexes
+
+
+def find_peaks(trace: np.ndarray, threshold: float, excursion: float,
+               order: Literal['AMPL', 'FREQ', 'TIME'] = 'AMPL',
+               peaks: Literal['ALL', 'GTDL', 'LTDL'] = 'ALL',
+               display_line: float | None = None,
+               chunk: int = 1 << 20) -> np.ndarray:
+    """Host side analogue of `:CALC:DATA:PEAK?` for structured (freq, ampl)
+    traces of any length, including memory mapped stitched scans. Peaks
+    must exceed `threshold` and rise and fall by `excursion` dB. `GTDL` and
+    `LTDL` keep only peaks above or below `display_line`. Returns (N, 2)
+    array of (amplitude, frequency) pairs like `parse_peak_list`."""
+    ampl: np.ndarray = trace['ampl']
+    if len(ampl) < 3:
+        return np.empty((0, 2))
+    indexes: np.ndarray = _local_maxima(ampl, threshold, chunk)
+    indexes = _filter_excursion(ampl, indexes, excursion)
+    if peaks != 'ALL':
+        if display_line is None:
+            raise ValueError(f'Display line is required for {peaks} peaks')
+        above: np.ndarray = ampl[indexes] > display_line
+        indexes = indexes[above if peaks == 'GTDL' else ~above]
+    if order == 'AMPL':
+        indexes = indexes[np.argsort(-ampl[indexes], kind='stable')]
+    return np.column_stack((ampl[indexes].astype(np.float64),
+                            trace['freq'][indexes].astype(np.float64)))
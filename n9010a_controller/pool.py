@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Literal
+import numpy as np
+from n9010a_controller.session import N9010ASession
+from n9010a_controller.stitching import StitchingEngine, StitchingProgress
+
+
+class AnalyzerPool:
+    """Persistent sessions with a rack of analyzers. Commands to one
+    instrument are serialized by its lock, different instruments are
+    driven concurrently and results are keyed by instrument IP. Lost
+    connections are reopened with exponential backoff."""
+    def __init__(self, ips: list[str], port: int = 5025, retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 10) -> None:
+        self.sessions: dict[str, N9010ASession] = {
+            ip: N9010ASession(ip, port) for ip in ips
+        }
+        self.retries: int = retries
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self._locks: dict[str, asyncio.Lock] = {ip: asyncio.Lock() for ip in ips}
+
+    async def __aenter__(self) -> 'AnalyzerPool':
+        await self.connect_all()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.disconnect_all()
+
+    async def _connect(self, ip: str) -> None:
+        session: N9010ASession = self.sessions[ip]
+        delay: float = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                if await session.connect():
+                    return
+            except OSError as err:
+                print(f'{ip}: connection failed: {err}')
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+        raise ConnectionError(f'{ip}: not connected after {self.retries + 1} attempts')
+
+    async def connect_all(self) -> None:
+        await asyncio.gather(*[self._connect(ip) for ip in self.sessions])
+
+    async def disconnect_all(self) -> None:
+        await asyncio.gather(*[session.disconnect()
+                               for session in self.sessions.values()
+                               if session.is_connected()])
+
+    async def run(self, ip: str,
+                  func: Callable[[N9010ASession], Awaitable[Any]]) -> Any:
+        """Runs `func` with the instrument session under its lock. If the
+        connection is lost, reconnects and retries once."""
+        async with self._locks[ip]:
+            session: N9010ASession = self.sessions[ip]
+            if not session.is_connected():
+                await self._connect(ip)
+            try:
+                return await func(session)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self._connect(ip)
+                return await func(session)
+
+    async def map(self, func: Callable[[N9010ASession], Awaitable[Any]],
+                  return_exceptions: bool = False) -> dict[str, Any]:
+        """Runs `func` on all instruments concurrently."""
+        results: list[Any] = await asyncio.gather(
+            *[self.run(ip, func) for ip in self.sessions],
+            return_exceptions=return_exceptions
+        )
+        return dict(zip(self.sessions, results))
+
+    async def sweep_all(self, return_exceptions: bool = False) -> dict[str, np.ndarray]:
+        return await self.map(lambda session: session.sweep(), return_exceptions)
+
+    async def peaks_all(self, threshold: int, excursion: int,
+                        order: Literal['AMPL', 'FREQ', 'TIME'] = 'AMPL',
+                        peaks: Literal['ALL', 'GTDL', 'LTDL'] = 'ALL',
+                        return_exceptions: bool = False) -> dict[str, np.ndarray]:
+        return await self.map(lambda session: session.peaks(threshold, excursion,
+                                                            order, peaks),
+                              return_exceptions)
+
+    async def stitch(self, from_hz: int, to_hz: int, step_hz: int,
+                     progress: StitchingProgress | None = None,
+                     points: int | None = None) -> np.ndarray:
+        """Splits one span between all instruments of the pool."""
+        for ip, session in self.sessions.items():
+            if not session.is_connected():
+                await self._connect(ip)
+        locks: list[asyncio.Lock] = list(self._locks.values())
+        for lock in locks:
+            await lock.acquire()
+        try:
+            engine = StitchingEngine(list(self.sessions.values()))
+            return await engine.run(from_hz, to_hz, step_hz, progress, points)
+        finally:
+            for lock in locks:
+                lock.release()
@@ -6,7 +6,7 @@ class _Widgets:
     screenshot_filename_line_edit: QtWidgets.QLineEdit
     custom_cmd_line_edit: QtWidgets.QLineEdit
 
-    meas_result_table: QtWidgets.QTableWidget
+    meas_result_table: QtWidgets.QTableView
 
     connect_button: QtWidgets.QPushButton
     save_screen_button: QtWidgets.QPushButton
@@ -23,6 +23,9 @@ class _Widgets:
     sweep_config_button: QtWidgets.QPushButton
     mech_att_button: QtWidgets.QPushButton
     elec_att_button: QtWidgets.QPushButton
+    metrics_button: QtWidgets.QPushButton
+    analysis_button: QtWidgets.QPushButton
+    mask_button: QtWidgets.QPushButton
 
     start_freq_dspin_box: QtWidgets.QDoubleSpinBox
     stop_freq_dspin_box: QtWidgets.QDoubleSpinBox
@@ -45,7 +48,13 @@ class _Widgets:
     theme_combo_box: QtWidgets.QComboBox
 
     auto_restart_check_box: QtWidgets.QCheckBox
+    host_peaks_check_box: QtWidgets.QCheckBox
     mech_att_check_box: QtWidgets.QCheckBox
+    csv_export_check_box: QtWidgets.QCheckBox
+    archive_check_box: QtWidgets.QCheckBox
+    record_check_box: QtWidgets.QCheckBox
+    adaptive_step_check_box: QtWidgets.QCheckBox
     processing_label: QtWidgets.QLabel
     peak_group_box: QtWidgets.QGroupBox
-    stitching_progress_bar: QtWidgets.QProgressBar
\ No newline at end of file
+    stitching_progress_bar: QtWidgets.QProgressBar
+    spectrum_layout: QtWidgets.QVBoxLayout
\ No newline at end of file
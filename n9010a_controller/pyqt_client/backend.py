@@ -1,32 +1,79 @@
-from ast import literal_eval
 import asyncio
+import multiprocessing
+import sys
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
-import struct
-from PyQt6 import QtWidgets
+from typing import TYPE_CHECKING
+from PyQt6 import QtCore, QtWidgets
 import qasync
 import numpy as np
-import matplotlib.pyplot as plt
-from PyQt6.uic.load_ui import loadUi
-from n9010a_controller.n9010a_api import N9010A_API
+from n9010a_controller.batch import CommandBatch
+from n9010a_controller.file_transfer import FileTransfer
+from n9010a_controller.session import AnalyzerConfig, N9010ASession
+from n9010a_controller.storage import TraceWriter, export_csv
 from n9010a_controller.pyqt_client._widgets import _Widgets
-from python_tcp.aio.client import SocketClient
+from n9010a_controller.pyqt_client.peak_table_model import PeakTableModel
+
+if TYPE_CHECKING:
+    from n9010a_controller.masks import MaskEngine
+    from n9010a_controller.analysis import TraceAnalyzer
+    from n9010a_controller.spectrogram import SpectrogramArchive
+    from n9010a_controller.pyqt_client.metrics_panel import MetricsPanel
+    from n9010a_controller.pyqt_client.spectrum_view import SpectrumView
+
+
+def setup_ui(widget: QtWidgets.QWidget) -> None:
+    """Builds widgets from the module generated by `to_exe.py` from
+    `N9010A.ui`. Falls back to parsing the .ui file if the module is missing
+    or older than the .ui file (e.g. while editing the form). Frozen builds
+    always use the module: it has no file on disk and the bundled .ui is
+    extracted anew on every start."""
+    ui_path: Path = Path(__file__).parent.joinpath('N9010A.ui')
+    try:
+        from n9010a_controller.pyqt_client import _n9010a_ui
+        if not getattr(sys, 'frozen', False) and ui_path.exists() and \
+                ui_path.stat().st_mtime > Path(_n9010a_ui.__file__).stat().st_mtime:
+            raise ImportError('Generated UI module is outdated')
+        ui = _n9010a_ui.Ui_Form()  # type: ignore
+        ui.setupUi(widget)
+        # Generated class keeps widgets in its own attributes, the
+        # controller expects them on itself like `loadUi` sets them.
+        vars(widget).update(vars(ui))
+    except (ImportError, OSError):
+        from PyQt6.uic.load_ui import loadUi
+        loadUi(ui_path, widget)
 
 
 class N9010A_Controller(QtWidgets.QWidget, _Widgets):
     def __init__(self, ip: str = '') -> None:
         super().__init__()
-        loadUi(Path(__file__).parent.joinpath('N9010A.ui'), self)
-        self.api = N9010A_API()
-        self.device = SocketClient(ip, 5025)
+        setup_ui(self)
+        self.session = N9010ASession(ip, 5025)
+        self.api = self.session.api
+        self.device = self.session.device
         self.device.connected.subscribe(self.on_successfull_connection)
-        self.device.received.subscribe(lambda x: print(x))
         self.ip_line_edit.setText(ip)
-        self.peaks: list[tuple[float, float]] = []
+        self.last_trace: np.ndarray | None = None
         self.processing_label.setVisible(False)
         self.peak_group_box.setVisible(False)
         self.stitching_progress_bar.setVisible(False)
         self.mech_att_check_box.toggled.connect(self.on_auto_att_toggled)
+        self.adaptive_step_check_box.toggled.connect(self.step_dspin_box.setDisabled)
+        self.spectrum_view: 'SpectrumView | None' = None
+        self.metrics_panel: 'MetricsPanel | None' = None
+        self.archive: 'SpectrogramArchive | None' = None
+        self.analyzer: 'TraceAnalyzer | None' = None
+        self.mask_engine: 'MaskEngine | None' = None
+        self.metrics_button.toggled.connect(self.on_metrics_toggled)
+        self.record_check_box.toggled.connect(self.on_record_toggled)
+        self.peak_model = PeakTableModel(self)
+        self.meas_result_table.setModel(self.peak_model)
+        header = self.meas_result_table.horizontalHeader()
+        if header:
+            header.setSortIndicator(-1, QtCore.Qt.SortOrder.DescendingOrder)
+            header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.meas_result_table.setSortingEnabled(True)
 
     def connection_status(self) -> bool:
         return self.device._connection_status
@@ -38,17 +85,13 @@ class N9010A_Controller(QtWidgets.QWidget, _Widgets):
     async def on_send_cmd_button_pressed(self):
         cmd = self.custom_cmd_line_edit.text() + '\n'
         if '?' in cmd:
-            print(await self.device.txrx(cmd.encode('ascii')))
+            print(await self.session.query(cmd.encode('ascii')))
         else:
-            await self.device.send(cmd.encode('ascii'))
+            await self.session.send(cmd.encode('ascii'))
 
     @qasync.asyncSlot()
     async def on_read_button_pressed(self):
-        try:
-            buffer = await asyncio.wait_for(self.device.reader.read(1024), 1.5)
-            print(buffer)
-        except TimeoutError:
-            print('timeout')
+        print(await self.session.channel.flush(1.5))
 
     @qasync.asyncSlot()
     async def on_sweep_config_button_pressed(self):
@@ -57,170 +100,256 @@ class N9010A_Controller(QtWidgets.QWidget, _Widgets):
         points: int = self.points_spin_box.value()
         aver_count: int = self.aver_count_spin_box.value()
 
-        await self.device.send(self.api.set_points_amount(points))
-        await self.device.send(self.api.set_res_bandwidth(rbw, 'HZ'))
-        await self.device.send(self.api.set_video_bandwidth(vbw, 'HZ'))
-        await self.device.send(self.api.set_averaging(True))
-        await self.device.send(self.api.set_averaging_amount(aver_count))
+        await self.session.configure(points=points, rbw=rbw, vbw=vbw,
+                                     aver_amount=aver_count)
 
     @qasync.asyncSlot()
     async def on_read_san_button_pressed(self):
         result = await self._single_sweep()
         if result is not None:
-            data = result.reshape((-1, 2)).T
-            self._save_result(data)
-            plt.scatter(data[0], data[1], s=5)
-            plt.plot(*data)
-            plt.show()
+            self.last_trace = result
+            await self._save_result(result)
+            self._check_masks(result)
+            self.show_trace(result)
+
+    def show_trace(self, trace: np.ndarray) -> None:
+        """Creates the plot on the first trace, so matplotlib isn't imported
+        at startup."""
+        if self.spectrum_view is None:
+            from n9010a_controller.pyqt_client.spectrum_view import SpectrumView
+            self.spectrum_view = SpectrumView(self)
+            self.spectrum_layout.addWidget(self.spectrum_view)
+        self.spectrum_view.set_trace(trace)
 
-    def _save_result(self, data: np.ndarray):
+    @qasync.asyncSlot()
+    async def on_analysis_button_pressed(self) -> None:
+        """Analyzes the Center/Span channel of the last trace in worker
+        processes."""
+        if self.last_trace is None or not len(self.last_trace):
+            print('no trace to analyze')
+            return
+        from n9010a_controller.analysis import SharedTrace, TraceAnalyzer
+        if self.analyzer is None:
+            self.analyzer = TraceAnalyzer()
+        trace: np.ndarray = self.last_trace
+        channel = (self.center_freq_dspin_box.value() * 1e6,
+                   self.span_freq_dspin_box.value() * 1e6)
+        freq = trace['freq']
+        rbw: float = float(freq[-1] - freq[0]) / max(len(freq) - 1, 1)
+        if self.session.is_connected():
+            rbw = float(await self.session.query_value(self.api.get_res_bandwidth()))
+        self.processing_label.setVisible(True)
+        try:
+            with SharedTrace(trace) as shared:
+                power, obw, (_, floor), spurs = await asyncio.gather(
+                    self.analyzer.channel_powers(shared, [channel], rbw),
+                    self.analyzer.occupied_bandwidths(shared, [channel]),
+                    self.analyzer.noise_floor(shared),
+                    self.analyzer.spurs(shared, margin=self.trig_max_spin_box.value()))
+        finally:
+            self.processing_label.setVisible(False)
+        print(f'channel power: {power[0]:.2f} dBm, OBW: {obw[0].bandwidth:.0f} Hz '
+              f'({obw[0].low:.0f} - {obw[0].high:.0f} Hz), '
+              f'noise floor: {float(np.median(floor)):.2f} dBm, spurs: {len(spurs)}')
+        self.show_peaks(spurs)
+
+    def on_mask_button_pressed(self) -> None:
+        paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
+            self, 'Limit masks', str(Path.cwd()), 'CSV (*.csv);;All files (*)')
+        if not paths:
+            self.mask_engine = None
+            print('masks are cleared')
+            return
+        from n9010a_controller.masks import LimitMask, MaskEngine
+        masks = [LimitMask.from_csv(path, 'lower' if Path(path).stem.lower()
+                                    .endswith('_lower') else 'upper')
+                 for path in paths]
+        self.mask_engine = MaskEngine(masks)
+        print(f'masks: {", ".join(f"{mask.name} ({mask.kind})" for mask in masks)}')
+
+    def _check_masks(self, trace: np.ndarray) -> None:
+        """Tests the trace against loaded masks, failed bins are shown in
+        the peak table."""
+        if self.mask_engine is None or not len(trace):
+            return
+        result = self.mask_engine.evaluate(trace)
+        if result.passed[0]:
+            print(f'mask PASS, margin {result.margin[0]:.2f} dB')
+            return
+        print(f'mask FAIL: {result.violations[0]} bins, '
+              f'worst {result.worst_margin[0, 0]:.2f} dB at {result.worst_freq[0, 0]:.0f} Hz')
+        failed = result.worst_margin[0] < 0
+        freq = result.worst_freq[0][failed]
+        ampl = np.interp(freq, trace['freq'], trace['ampl'])
+        self.show_peaks(np.column_stack((ampl, freq)))
+
+    def closeEvent(self, event) -> None:
+        self.session.stop_recording()
+        if self.analyzer is not None:
+            self.analyzer.shutdown()
+        super().closeEvent(event)
+
+    def on_record_toggled(self, state: bool) -> None:
+        if not state:
+            self.session.stop_recording()
+            return
+        ts: str = datetime.now().strftime("%Y-%m-%d_%H.%M.%S")
+        log = self.session.start_recording(Path.cwd() / 'Measurements' / f'{ts}.scpilog')
+        print(f'recording to {log.path}')
+
+    def on_metrics_toggled(self, state: bool) -> None:
+        """Metrics are recorded only while the panel button is checked."""
+        if not state:
+            self.session.disable_metrics()
+            if self.metrics_panel is not None:
+                self.metrics_panel.hide()
+            return
+        metrics = self.session.enable_metrics()
+        if self.metrics_panel is None:
+            from n9010a_controller.pyqt_client.metrics_panel import MetricsPanel
+            self.metrics_panel = MetricsPanel(metrics, self)
+        self.metrics_panel.metrics = metrics
+        self.metrics_panel.show()
+
+    async def _new_writer(self) -> TraceWriter:
+        """Writer of a new measurement file. Current sweep settings are read
+        back (through the state cache) for its sidecar."""
         folder_path: Path = Path.cwd() / 'Measurements'
-        folder_path.mkdir(exist_ok=True)
         ts: str = datetime.now().strftime("%Y-%m-%d_%H.%M.%S")
-        filename: str = ts + '.csv'
-        np.savetxt(folder_path / filename, data.T, delimiter=';', fmt='%.3f')
+        settings = asdict(await self.session.read_config())
+        return TraceWriter(folder_path / (ts + '.bin'), settings)
+
+    def _export_csv(self, writer: TraceWriter, trace: np.ndarray) -> None:
+        if self.csv_export_check_box.isChecked():
+            export_csv(trace, writer.path.with_suffix('.csv'))
+
+    async def _save_result(self, trace: np.ndarray):
+        with await self._new_writer() as writer:
+            writer.append(trace)
+        self._export_csv(writer, trace)
+        self._archive(trace)
+
+    def _archive(self, trace: np.ndarray) -> None:
+        """Appends the sweep to the spectrogram archive. The archive grid
+        is taken from the first archived trace."""
+        if not self.archive_check_box.isChecked() or not len(trace):
+            return
+        if self.archive is None:
+            from n9010a_controller.spectrogram import SpectrogramArchive
+            self.archive = SpectrogramArchive.for_trace(
+                Path.cwd() / 'Measurements' / 'spectrogram', trace)
+        self.archive.ingest(trace)
 
     @qasync.asyncSlot()
     async def on_start_stitching_button_pressed(self):
         from_hz = int(self.from_dspin_box.value() * 1e6)
         to_hz = int(self.to_dspin_box.value() * 1e6)
         step_hz = int(self.step_dspin_box.value() * 1e6)
-        steps: int = (to_hz - from_hz) // step_hz
         self.stitching_progress_bar.setValue(0)
         self.stitching_progress_bar.setVisible(True)
-        result = np.array([])
-        for i, freq in enumerate(range(from_hz, to_hz, step_hz), 1):
-            await self.device.send(self.api.set_start_freq(freq, 'HZ'))
-            await self.device.send(self.api.set_stop_freq(freq + step_hz, 'HZ'))
-            step_result = await self._single_sweep()
-            if step_result is not None:
-                result = np.append(result, step_result)
-            progress = i / steps * 100
-            self.stitching_progress_bar.setValue(int(progress))
-        self.stitching_progress_bar.setVisible(False)
-        self._save_result(result)
-        data = result.reshape((-1, 2)).T
-        plt.scatter(data[0], data[1], s=5)
-        plt.plot(*data)
-        plt.show()
+        self.processing_label.setVisible(True)
+        writer: TraceWriter = await self._new_writer()
+        try:
+            if self.adaptive_step_check_box.isChecked():
+                rbw = int(self.rbw_dspin_box.value() * 1e3)
+                result = await self.session.stitch_adaptive(from_hz, to_hz, rbw,
+                                                            self._on_stitching_progress,
+                                                            writer)
+            else:
+                result = await self.session.stitch(from_hz, to_hz, step_hz,
+                                                   self._on_stitching_progress,
+                                                   writer)
+        finally:
+            writer.close()
+            self.processing_label.setVisible(False)
+            self.stitching_progress_bar.setVisible(False)
+        self.last_trace = result
+        self._export_csv(writer, result)
+        self._archive(result)
+        self._check_masks(result)
+        self.show_trace(result)
+
+    def _on_stitching_progress(self, done: int, total: int, rate: float) -> None:
+        self.stitching_progress_bar.setValue(int(done / total * 100))
+        self.stitching_progress_bar.setFormat(f'%p% ({rate:.1f} seg/s)')
 
     async def _single_sweep(self):
-        buffer = b''
-        await self.device.send(self.api.read_san(1))
         self.processing_label.setVisible(True)
         try:
-            buffer += await asyncio.wait_for(self.device.reader.read(1024), 15)
-            header: int = literal_eval(buffer[1:2].decode('ascii')) + 2
-            # bytes_amount: int = literal_eval(buffer[2: val + 2].decode('ascii')) // 8
+            return await self.session.sweep()
         except TimeoutError:
-            print('timeout')
-            self.processing_label.setVisible(False)
+            print(f'timeout: no trace in {self.session.sweep_timeout:.1f} s')
             return
-        while True:
-            try:
-                buffer += await asyncio.wait_for(self.device.reader.read(1024), 0.1)
-            except TimeoutError:
-                break
-        self.processing_label.setVisible(False)
-        result = np.array([struct.unpack('>f', buffer[i:i + 4])[0]
-                           for i in range(header, len(buffer), 4)
-                           if len(buffer[i:i + 4]) == 4])
-        return result
-
-
+        finally:
+            self.processing_label.setVisible(False)
 
     @qasync.asyncSlot()
     async def on_connect_button_pressed(self) -> None:
         if not self.device.is_connected():
-            if await self.device.connect(self.ip_line_edit.text(),
-                                        self.port_spin_box.value(),
-                                        False):
+            if await self.session.connect(self.ip_line_edit.text(),
+                                          self.port_spin_box.value()):
                 self.connect_button.setText('Disconnect')
         else:
-            await self.device.disconnect()
+            await self.session.disconnect()
             self.connect_button.setText('Connect')
 
 
     async def on_successfull_connection(self) -> None:
-        print(await self.device.txrx(self.api.identification_query()))
-        await self.device.send(self.api.set_mode('SA'))
-        await self.device.send(self.api.set_averaging(True))
-
-        center_freq: int = await self._decode_answer(self.api.get_center_freq())
-        span: int = await self._decode_answer(self.api.get_freq_span())
-        start_freq: int = await self._decode_answer(self.api.get_start_freq())
-        stop_freq: int = await self._decode_answer(self.api.get_stop_freq())
-        threshold: float = await self._decode_answer(self.api.get_threshold())
-        points: int = await self._decode_answer(self.api.get_points_amount())
-        rbw: int = await self._decode_answer(self.api.get_res_bandwidth())
-        vbw: int = await self._decode_answer(self.api.get_video_bandwidth())
-        aver_amount: int = await self._decode_answer(self.api.get_averaging_amount())
-        mech_auto: int = await self._decode_answer(self.api.get_mech_attenuation_auto_status())
-        self.on_auto_att_toggled(bool(mech_auto))
-        mech: int = await self._decode_answer(self.api.get_mech_attenuation())
-        elec: int = await self._decode_answer(self.api.get_electronic_attenuation())
-        self.rbw_dspin_box.setValue(rbw / 1000)
-        self.vbw_dspin_box.setValue(vbw / 1000)
-        self.aver_count_spin_box.setValue(aver_amount)
-        self.points_spin_box.setValue(points)
-        self.center_freq_dspin_box.setValue(center_freq // 1e6)
-        self.start_freq_dspin_box.setValue(start_freq // 1e6)
-        self.trig_min_spin_box.setValue(int(threshold))
-        self.stop_freq_dspin_box.setValue(stop_freq // 1e6)
-        self.span_freq_dspin_box.setValue(span // 1e6)
-        self.mech_att_check_box.setChecked(bool(mech_auto))
-        self.mech_att_spin_box.setValue(mech)
-        self.elec_att_spin_box.setValue(elec)
-        await self.device.send(self.api.set_continuous_sweep(False))
-        await self.device.send(self.api.set_trace_type(1, 'MAXH'))
-        # await self.device.send(self.api.set_continues_peak_search(1, True))
-        # await self.device.send(self.api.set_peak_table_state(True))
-
-    async def _decode_answer(self, cmd: bytes):
-        answer: bytes = await self.device.txrx(cmd)
-        return literal_eval(answer.decode())
+        print(await self.session.identify())
+        config: AnalyzerConfig = await self.session.initialize()
+        self.on_auto_att_toggled(config.mech_att_auto)
+        self.rbw_dspin_box.setValue(config.rbw / 1000)
+        self.vbw_dspin_box.setValue(config.vbw / 1000)
+        self.aver_count_spin_box.setValue(config.aver_amount)
+        self.points_spin_box.setValue(config.points)
+        self.center_freq_dspin_box.setValue(config.center_freq // 1e6)
+        self.start_freq_dspin_box.setValue(config.start_freq // 1e6)
+        self.trig_min_spin_box.setValue(int(config.threshold))
+        self.stop_freq_dspin_box.setValue(config.stop_freq // 1e6)
+        self.span_freq_dspin_box.setValue(config.span // 1e6)
+        self.mech_att_check_box.setChecked(config.mech_att_auto)
+        self.mech_att_spin_box.setValue(config.mech_att)
+        self.elec_att_spin_box.setValue(config.elec_att)
+        # await self.session.send(self.api.set_continues_peak_search(1, True))
+        # await self.session.send(self.api.set_peak_table_state(True))
 
     @qasync.asyncSlot()
     async def on_set_freq_button_pressed(self) -> None:
         start_freq: int = int(self.start_freq_dspin_box.value() * 1e6)
         stop_freq: int = int(self.stop_freq_dspin_box.value() * 1e6)
-        await self.device.send(self.api.set_start_freq(start_freq, 'HZ'))
-        await self.device.send(self.api.set_stop_freq(stop_freq, 'HZ'))
+        await self.session.configure(start_freq=start_freq, stop_freq=stop_freq)
 
     @qasync.asyncSlot()
     async def on_set_freq_span_button_pressed(self) -> None:
         start_freq: int = int(self.center_freq_dspin_box.value() * 1e6)
         span_freq: int = int(self.span_freq_dspin_box.value() * 1e6)
-        await self.device.send(self.api.set_center_freq(start_freq, 'HZ'))
-        await self.device.send(self.api.set_freq_span(span_freq, 'HZ'))
+        await self.session.execute(CommandBatch(
+            self.api.set_center_freq(start_freq, 'HZ'),
+            self.api.set_freq_span(span_freq, 'HZ')))
 
     @qasync.asyncSlot()
     async def on_mech_att_button_pressed(self):
         auto: bool = self.mech_att_check_box.isChecked()
         if not auto:
             att: int = self.mech_att_spin_box.value()
-            await self.device.send(self.api.set_mech_attenuation(att))
+            await self.session.send(self.api.set_mech_attenuation(att))
         else:
-            await self.device.send(self.api.set_mech_attenuation_auto_status(auto))
+            await self.session.send(self.api.set_mech_attenuation_auto_status(auto))
 
     @qasync.asyncSlot()
     async def on_elec_att_button_pressed(self):
         att: int = self.elec_att_spin_box.value()
-        await self.device.send(self.api.set_electronic_attenuation(att))
-
-    def parse_peak_data(self, data: bytes) -> None:
-        self.peaks = self.api.parse_measured_data(data)
-        self.meas_result_table.setRowCount(len(self.peaks))
-        self.meas_result_table.setColumnCount(2)
-        header_labels: list[str] = ["Amplitude, dBm", "Frequency, Hz"]
-        self.meas_result_table.setHorizontalHeaderLabels(header_labels)
-        for i, (freq, ampl) in enumerate(self.peaks):
-            self.meas_result_table.setItem(i, 0, QtWidgets.QTableWidgetItem(f"{freq}"))
-            self.meas_result_table.setItem(i, 1, QtWidgets.QTableWidgetItem(f"{ampl}"))
+        await self.session.send(self.api.set_electronic_attenuation(att))
+
+    @property
+    def peaks(self) -> np.ndarray:
+        return self.peak_model.peaks
+
+    def show_peaks(self, peaks: np.ndarray) -> None:
         header = self.meas_result_table.horizontalHeader()
         if header:
-            header.setStretchLastSection(True)
-            header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+            header.setSortIndicator(-1, QtCore.Qt.SortOrder.DescendingOrder)
+        self.peak_model.set_peaks(peaks)
 
     @qasync.asyncSlot()
     async def on_measure_peaks_button_pressed(self) -> None:
@@ -228,32 +357,49 @@ class N9010A_Controller(QtWidgets.QWidget, _Widgets):
         trig_min: int = self.trig_min_spin_box.value()
         order_list: list[str] = ['AMPL', 'FREQ', 'TIME']
         peak_order: str = order_list[self.peak_order_combo_box.currentIndex()]
-        cmd: bytes = self.api.calculate_peaks(1, trig_min, trig_max, peak_order) # type: ignore
-        data: bytes = await self.device.txrx(cmd)
-        self.parse_peak_data(data)
+        if self.host_peaks_check_box.isChecked() and self.last_trace is not None:
+            from n9010a_controller.peaks import find_peaks
+            peaks = find_peaks(self.last_trace, trig_min, trig_max, peak_order)  # type: ignore
+        else:
+            peaks = await self.session.peaks(trig_min, trig_max, peak_order)  # type: ignore
+        self.show_peaks(peaks)
         if self.auto_restart_check_box.isChecked():
-            await self.device.txrx(self.api.restart_measure())
+            await self._restart_measure()
+
+    async def _restart_measure(self) -> None:
+        """Restarts the measurement and waits until it is complete, so the
+        next peak search doesn't read a trace in the middle of a sweep."""
+        self.processing_label.setVisible(True)
+        try:
+            await self.session.restart(poll=True, measurement=True)
+        except TimeoutError:
+            print('timeout: measurement was not completed')
+        finally:
+            self.processing_label.setVisible(False)
 
     @qasync.asyncSlot()
     async def on_set_color_theme_button_pressed(self) -> None:
         themes: list[str] = ['TDC', 'TDM', 'FCOL', 'FMON']
         theme: str = themes[self.theme_combo_box.currentIndex()]
-        await self.device.send(self.api.set_screenshot_theme(theme))  # type: ignore
+        await self.session.send(self.api.set_screenshot_theme(theme))  # type: ignore
 
     @qasync.asyncSlot()
     async def on_save_screen_button_pressed(self) -> None:
         filename: str = self.screenshot_filename_line_edit.text()
-        await self.device.send(self.api.save_screenshot(filename))
+        path = await FileTransfer(self.session).screenshot(filename,
+                                                           Path.cwd() / 'Screenshots')
+        print(f'screenshot saved to {path}')
 
     @qasync.asyncSlot()
     async def on_power_down_button_pressed(self) -> None:
-        await self.device.send(self.api.power_down('NORMAL'))
+        await self.session.send(self.api.power_down('NORMAL'))
 
     @qasync.asyncSlot()
     async def on_restart_measure_button_pressed(self):
-        await self.device.send(self.api.restart_measure())
+        await self._restart_measure()
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication([])
     w = N9010A_Controller('10.2.63.45')
     event_loop = qasync.QEventLoop(app)
@@ -0,0 +1,61 @@
+from pathlib import Path
+from PyQt6 import QtCore, QtGui, QtWidgets
+from n9010a_controller.metrics import CommandMetrics
+
+
+class MetricsPanel(QtWidgets.QWidget):
+    """Separate window with live per-command latency table. Refreshed by
+    timer only while visible, metrics can be saved as JSON or Prometheus
+    text."""
+    def __init__(self, metrics: CommandMetrics,
+                 parent: QtWidgets.QWidget | None = None,
+                 interval_ms: int = 1000) -> None:
+        super().__init__(parent, QtCore.Qt.WindowType.Window)
+        self.setWindowTitle('SCPI metrics, ms')
+        self.resize(900, 300)
+        self.metrics: CommandMetrics = metrics
+        self.text = QtWidgets.QPlainTextEdit(self)
+        self.text.setReadOnly(True)
+        self.text.setLineWrapMode(QtWidgets.QPlainTextEdit.LineWrapMode.NoWrap)
+        self.text.setFont(QtGui.QFontDatabase.systemFont(
+            QtGui.QFontDatabase.SystemFont.FixedFont))
+        clear_button = QtWidgets.QPushButton('Clear', self)
+        clear_button.clicked.connect(self.on_clear)
+        save_button = QtWidgets.QPushButton('Save...', self)
+        save_button.clicked.connect(self.on_save)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(clear_button)
+        buttons.addWidget(save_button)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.text)
+        layout.addLayout(buttons)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self) -> None:
+        self.text.setPlainText(self.metrics.summary())
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start()
+
+    def hideEvent(self, event) -> None:
+        super().hideEvent(event)
+        self.timer.stop()
+
+    def on_clear(self) -> None:
+        self.metrics.clear()
+        self.refresh()
+
+    def on_save(self) -> None:
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Save metrics', str(Path.cwd() / 'metrics.json'),
+            'JSON (*.json);;Prometheus text (*.prom *.txt)')
+        if not path:
+            return
+        text: str = self.metrics.to_json() if path.endswith('.json') \
+            else self.metrics.to_prometheus()
+        Path(path).write_text(text)
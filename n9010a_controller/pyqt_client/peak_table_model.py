@@ -0,0 +1,65 @@
+import numpy as np
+from PyQt6 import QtCore
+
+
+Qt = QtCore.Qt
+
+
+class PeakTableModel(QtCore.QAbstractTableModel):
+    """Table model over (N, 2) array of (amplitude, frequency) peaks.
+    Cells are formatted only when the view asks for visible rows, sorting
+    reorders the array with numpy, so views with hundreds of thousands
+    of peaks are filled instantly."""
+    HEADERS: tuple[str, str] = ('Amplitude, dBm', 'Frequency, Hz')
+    FORMATS: tuple[str, str] = ('{:.2f}', '{:.0f}')
+
+    def __init__(self, parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        self._peaks: np.ndarray = np.empty((0, 2))
+
+    @property
+    def peaks(self) -> np.ndarray:
+        return self._peaks
+
+    def set_peaks(self, peaks: np.ndarray) -> None:
+        self.beginResetModel()
+        self._peaks = np.asarray(peaks, dtype=np.float64).reshape(-1, 2)
+        self.endResetModel()
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._peaks)
+
+    def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else 2
+
+    def data(self, index: QtCore.QModelIndex,
+             role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        value: float = float(self._peaks[index.row(), index.column()])
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.FORMATS[index.column()].format(value)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return repr(value)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                   role: int = Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def sort(self, column: int,
+             order: Qt.SortOrder = Qt.SortOrder.AscendingOrder) -> None:
+        if column < 0 or not len(self._peaks):
+            return
+        self.layoutAboutToBeChanged.emit()
+        indexes: np.ndarray = np.argsort(self._peaks[:, column], kind='stable')
+        if order == Qt.SortOrder.DescendingOrder:
+            indexes = indexes[::-1]
+        self._peaks = self._peaks[indexes]
+        self.layoutChanged.emit()
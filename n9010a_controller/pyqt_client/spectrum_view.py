@@ -0,0 +1,51 @@
+import numpy as np
+from PyQt6 import QtWidgets
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from n9010a_controller.decimation import minmax_decimate
+
+
+class SpectrumView(QtWidgets.QWidget):
+    """Embedded spectrum plot. The figure and its line artist are created
+    once, every update only replaces line data decimated by min/max to the
+    canvas width, so million points scans are redrawn interactively."""
+    def __init__(self, parent: QtWidgets.QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.figure = Figure(figsize=(5, 3), layout='tight')
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.canvas.setMinimumHeight(250)
+        self.axes = self.figure.add_subplot()
+        self.axes.set_xlabel('Frequency, Hz')
+        self.axes.set_ylabel('Amplitude, dBm')
+        self.axes.grid(True)
+        self.line, = self.axes.plot([], [], linewidth=0.8)
+        self._freq: np.ndarray = np.empty(0)
+        self._ampl: np.ndarray = np.empty(0)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+
+    def set_trace(self, trace: np.ndarray) -> None:
+        """Shows structured (freq, ampl) trace."""
+        self._freq = np.asarray(trace['freq'])
+        self._ampl = np.asarray(trace['ampl'])
+        self._redraw()
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        if len(self._freq):
+            self._redraw()
+
+    def _redraw(self) -> None:
+        if not len(self._freq):
+            self.line.set_data([], [])
+            self.canvas.draw_idle()
+            return
+        x, y = minmax_decimate(self._freq, self._ampl, max(self.canvas.width(), 1))
+        self.line.set_data(x, y)
+        if x[0] != x[-1]:
+            self.axes.set_xlim(x[0], x[-1])
+        y_min, y_max = float(y.min()), float(y.max())
+        margin: float = max((y_max - y_min) * 0.05, 1)
+        self.axes.set_ylim(y_min - margin, y_max + margin)
+        self.canvas.draw_idle()
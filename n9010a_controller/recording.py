@@ -0,0 +1,185 @@
+import asyncio
+import struct
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterator, NamedTuple
+
+if TYPE_CHECKING:
+    from python_tcp.aio.client import SocketClient
+
+
+MAGIC: bytes = b'N9010A-SCPI-LOG\x01'
+# Direction, seconds since the start of recording, data length.
+RECORD = struct.Struct('<BdI')
+TX: int = 0
+RX: int = 1
+
+
+class LogRecord(NamedTuple):
+    direction: int
+    timestamp: float
+    data: bytes
+
+
+class ScpiLog:
+    """Binary log of a raw SCPI byte stream. Every written program message
+    is one TX record, every chunk handed to the parser (reply line, block
+    header or payload) is one RX record, each with 13 bytes of framing:
+    direction, timestamp and length."""
+    def __init__(self, path: Path | str) -> None:
+        self.path: Path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: BinaryIO = self.path.open('wb')
+        self._file.write(MAGIC + struct.pack('<d', time.time()))
+        self._started: float = time.perf_counter()
+        self.records: int = 0
+
+    def write(self, direction: int, data: bytes) -> None:
+        if self._file.closed or not data:
+            return
+        self._file.write(RECORD.pack(direction, time.perf_counter() - self._started,
+                                     len(data)))
+        self._file.write(data)
+        self.records += 1
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_log(path: Path | str) -> Iterator[LogRecord]:
+    """Iterates records of the log written by `ScpiLog`. A record cut off by
+    an interrupted recording is ignored."""
+    with Path(path).open('rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a SCPI log')
+        file.read(8)
+        while len(head := file.read(RECORD.size)) == RECORD.size:
+            direction, timestamp, length = RECORD.unpack(head)
+            data: bytes = file.read(length)
+            if len(data) < length:
+                return
+            yield LogRecord(direction, timestamp, data)
+
+
+class _RecordingReader:
+    """Stream reader proxy which logs everything the parser consumes."""
+    def __init__(self, reader: asyncio.StreamReader, log: ScpiLog) -> None:
+        self._reader: asyncio.StreamReader = reader
+        self._log: ScpiLog = log
+
+    async def readexactly(self, n: int) -> bytes:
+        data: bytes = await self._reader.readexactly(n)
+        self._log.write(RX, data)
+        return data
+
+    async def readuntil(self, separator: bytes = b'\n') -> bytes:
+        data: bytes = await self._reader.readuntil(separator)
+        self._log.write(RX, data)
+        return data
+
+    async def read(self, n: int = -1) -> bytes:
+        data: bytes = await self._reader.read(n)
+        self._log.write(RX, data)
+        return data
+
+    def at_eof(self) -> bool:
+        return self._reader.at_eof()
+
+
+class RecordingDevice:
+    """Wraps `SocketClient` and logs its traffic. Everything else is
+    delegated to the wrapped client."""
+    def __init__(self, device: 'SocketClient', log: ScpiLog) -> None:
+        self.device: 'SocketClient' = device
+        self.log: ScpiLog = log
+        self._reader: _RecordingReader | None = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.device, name)
+
+    @property
+    def reader(self) -> _RecordingReader:
+        # Reader of the client is replaced on reconnection.
+        if self._reader is None or self._reader._reader is not self.device.reader:
+            self._reader = _RecordingReader(self.device.reader, self.log)
+        return self._reader
+
+    async def send(self, data: bytes) -> None:
+        self.log.write(TX, data)
+        await self.device.send(data)
+
+
+class ReplayDevice:
+    """Transport which plays back a log written by `ScpiLog` instead of an
+    analyzer, so sessions, stitching and peak code run on recorded traffic.
+    With `follow_commands` every RX record is released only after the
+    session has sent as many messages as preceded it in the log, so
+    replies never run ahead of their queries. In `realtime` mode original
+    delays between the last message and the reply are kept, otherwise
+    data is fed at full speed. Sent messages differing from the log are
+    collected in `mismatches`."""
+    def __init__(self, path: Path | str, realtime: bool = False,
+                 follow_commands: bool = True) -> None:
+        self.path: Path = Path(path)
+        self.realtime: bool = realtime
+        self.follow_commands: bool = follow_commands
+        self.records: list[LogRecord] = list(read_log(path))
+        self.expected: list[bytes] = [record.data for record in self.records
+                                      if record.direction == TX]
+        self.mismatches: list[tuple[int, bytes, bytes]] = []
+        self.reader: asyncio.StreamReader | None = None
+        self._sent: int = 0
+        self._sent_at: list[float] = []
+        self._progress = asyncio.Event()
+        self._feeder: asyncio.Task | None = None
+
+    def is_connected(self) -> bool:
+        return self._feeder is not None
+
+    async def connect(self, *_) -> bool:
+        await self.disconnect()
+        self.reader = asyncio.StreamReader()
+        self._sent = 0
+        self._sent_at.clear()
+        self._feeder = asyncio.create_task(self._feed())
+        return True
+
+    async def disconnect(self) -> None:
+        if self._feeder is not None:
+            self._feeder.cancel()
+            try:
+                await self._feeder
+            except asyncio.CancelledError:
+                pass
+            self._feeder = None
+
+    async def send(self, data: bytes) -> None:
+        if self._sent < len(self.expected) and self.expected[self._sent] != data:
+            self.mismatches.append((self._sent, self.expected[self._sent], data))
+        self._sent += 1
+        self._sent_at.append(time.perf_counter())
+        self._progress.set()
+
+    async def _feed(self) -> None:
+        reader: asyncio.StreamReader | None = self.reader
+        assert reader is not None
+        sent_before: int = 0
+        last_tx: float = 0
+        for record in self.records:
+            if record.direction == TX:
+                sent_before += 1
+                last_tx = record.timestamp
+                continue
+            if self.follow_commands:
+                while self._sent < sent_before:
+                    self._progress.clear()
+                    await self._progress.wait()
+            if self.realtime and sent_before and self._sent_at:
+                anchor: float = self._sent_at[min(sent_before, len(self._sent_at)) - 1]
+                delay: float = anchor + record.timestamp - last_tx - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            reader.feed_data(record.data)
+        reader.feed_eof()
+
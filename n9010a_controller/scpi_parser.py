@@ -0,0 +1,167 @@
+import re
+from typing import NamedTuple
+import numpy as np
+
+
+_ALIASES: dict[str, str] = {
+    ':SENS:FREQ:RF:CENT': ':FREQ:CENT',
+    ':SENS:FREQ:CENT': ':FREQ:CENT',
+    ':SENS:FREQ:STAR': ':FREQ:STAR',
+    ':SENS:FREQ:STOP': ':FREQ:STOP',
+    ':SENS:FREQ:SPAN': ':FREQ:SPAN',
+    ':SENS:BAND': ':BAND',
+    ':SENS:BAND:VID': ':BAND:VID',
+    ':SENS:SWE:POIN': ':SWE:POIN',
+    ':SENS:SWE:TIME': ':SWE:TIME',
+    ':SENS:AVER': ':AVER',
+    ':SENS:AVER:COUN': ':AVER:COUN',
+    ':SENS:POW:ATT': ':POW:ATT',
+    ':SENS:POW:ATT:AUTO': ':POW:ATT:AUTO',
+    ':SENS:POW:EATT': ':POW:EATT',
+}
+
+
+def _text(answer: bytes | str) -> str:
+    if isinstance(answer, (bytes, bytearray, memoryview)):
+        answer = bytes(answer).decode('ascii')
+    return answer.strip()
+
+
+def parse_string(answer: bytes | str) -> str:
+    """Strips response terminator and surrounding quotes of string answer,
+    e.g. `"TDC"\\n` -> `TDC`."""
+    text: str = _text(answer)
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"\'':
+        return text[1:-1]
+    return text
+
+
+def parse_float(answer: bytes | str) -> float:
+    return float(_text(answer))
+
+
+def parse_int(answer: bytes | str) -> int:
+    """Parses integer answer. Integers in NR3 format like `+1.001E+003`
+    are accepted too."""
+    text: str = _text(answer)
+    try:
+        return int(text)
+    except ValueError:
+        return int(float(text))
+
+
+def parse_bool(answer: bytes | str) -> bool:
+    text: str = parse_string(answer).upper()
+    if text in ('1', 'ON'):
+        return True
+    if text in ('0', 'OFF'):
+        return False
+    raise ValueError(f'Invalid boolean answer: {text!r}')
+
+
+def parse_scalar(answer: bytes | str) -> int | float | str:
+    """Parses answer of scalar query. Returns int for NR1 numbers, float for
+    NR2/NR3 numbers and string for character or quoted string data."""
+    text: str = _text(answer)
+    if text[:1] in '"\'':
+        return parse_string(text)
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_number_list(answer: bytes | str) -> np.ndarray:
+    """Parses comma separated numbers into float64 array."""
+    text: str = _text(answer)
+    if not text:
+        return np.empty(0, dtype=np.float64)
+    values: np.ndarray = np.fromstring(text, dtype=np.float64, sep=',')
+    if values.size != text.count(',') + 1:
+        raise ValueError(f'Invalid number list: {text[:64]!r}')
+    return values
+
+
+def parse_string_list(answer: bytes | str) -> list[str]:
+    """Splits comma separated answer like `:INST:CAT?` into strings."""
+    text: str = parse_string(answer)
+    if not text:
+        return []
+    return [parse_string(el) for el in text.split(',')]
+
+
+def parse_peak_list(answer: bytes | str) -> np.ndarray:
+    """Parses answer of `:CALC:DATA:PEAK?` query: peaks amount followed by
+    pairs of amplitude and frequency. Returns (N, 2) float64 array."""
+    values: np.ndarray = parse_number_list(answer)
+    if values.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    peaks_amount: int = int(values[0])
+    return values[1: 1 + 2 * peaks_amount].reshape((-1, 2))
+
+
+def canonical_header(header: str, strip_suffixes: bool = True) -> str:
+    """Upper case short form of the header with optional `:SENS` node
+    removed. Numeric suffixes are stripped by default, e.g.
+    `:calc:data1:peak?` -> `:CALC:DATA:PEAK?`."""
+    header = header.upper()
+    if strip_suffixes:
+        header = re.sub(r'(?<=[A-Z])\d+', '', header)
+    if not header.startswith((':', '*')):
+        header = ':' + header
+    query: bool = header.endswith('?')
+    header = header.rstrip('?')
+    header = _ALIASES.get(header, header)
+    return header + '?' if query else header
+
+
+def _split_unquoted(text: str, separator: str) -> list[str]:
+    parts: list[str] = []
+    start: int = 0
+    quoted: bool = False
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif char == separator and not quoted:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def split_message(message: str) -> list[str]:
+    """Splits program message into commands by `;` outside quotes."""
+    return [part.strip() for part in _split_unquoted(message, ';') if part.strip()]
+
+
+class CatalogEntry(NamedTuple):
+    name: str
+    type: str
+    size: int
+
+    @property
+    def is_dir(self) -> bool:
+        return self.type.upper() in ('DIR', 'FOLD', 'FOLDER')
+
+
+class Catalog(NamedTuple):
+    used: int
+    free: int
+    entries: list[CatalogEntry]
+
+
+def parse_catalog(answer: bytes | str) -> Catalog:
+    """Parses answer of `:MMEM:CAT?`:
+    `<used>,<free>{,"<name>,<type>,<size>"}`."""
+    fields: list[str] = [field.strip() for field in _split_unquoted(_text(answer), ',')]
+    if len(fields) < 2:
+        raise ValueError(f'Invalid catalog: {fields!r}')
+    entries: list[CatalogEntry] = []
+    for field in fields[2:]:
+        name, file_type, size = (parse_string(field).rsplit(',', 2) + ['', ''])[:3]
+        entries.append(CatalogEntry(name, file_type, parse_int(size) if size else 0))
+    return Catalog(parse_int(fields[0]), parse_int(fields[1]), entries)
@@ -0,0 +1,376 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+import asyncio
+import time
+import numpy as np
+from python_tcp.aio.client import SocketClient
+from n9010a_controller.batch import CommandBatch
+from n9010a_controller.metrics import CommandMetrics
+from n9010a_controller.recording import RecordingDevice, ReplayDevice, ScpiLog
+from n9010a_controller.n9010a_api import N9010A_API
+from n9010a_controller.scpi_parser import parse_peak_list, parse_scalar
+from n9010a_controller.state_cache import InstrumentState
+from n9010a_controller.storage import TraceWriter
+from n9010a_controller.stitching import (SegmentPlan, StitchingEngine,
+                                         StitchingProgress, plan_segments)
+from n9010a_controller.trace_decoder import TraceFormat, decode_trace
+from n9010a_controller.transport import CommandChannel
+
+
+@dataclass
+class AnalyzerConfig:
+    center_freq: float
+    span: float
+    start_freq: float
+    stop_freq: float
+    threshold: float
+    points: int
+    rbw: float
+    vbw: float
+    aver_amount: int
+    mech_att_auto: bool
+    mech_att: int
+    elec_att: int
+
+
+class N9010ASession:
+    """Headless asyncio session with one N9010A. Holds all instrument logic
+    used by the GUI, so it can be run in workers without Qt."""
+    def __init__(self, ip: str = '', port: int = 5025) -> None:
+        self.ip: str = ip
+        self.port: int = port
+        self.api = N9010A_API()
+        self.device = SocketClient(ip, port)
+        self.channel = CommandChannel(self.device)
+        self.query_timeout: float = 5
+        self.sweep_timeout: float = 15
+        self.sweep_margin: float = 2
+        self.config: AnalyzerConfig | None = None
+        self.state: InstrumentState | None = InstrumentState()
+        self.metrics: CommandMetrics | None = None
+        # Data format of trace blocks, set on the instrument by `initialize`.
+        self.trace_format: TraceFormat = 'REAL,32'
+
+    @classmethod
+    def replay(cls, path: Path | str, realtime: bool = False) -> 'N9010ASession':
+        """Session fed by the log recorded by `start_recording` instead of
+        the analyzer. `connect` starts playback."""
+        session = cls()
+        session.device = ReplayDevice(path, realtime)  # type: ignore
+        session.channel = CommandChannel(session.device)  # type: ignore
+        return session
+
+    def start_recording(self, path: Path | str) -> ScpiLog:
+        """Logs raw traffic with the analyzer until `stop_recording`."""
+        self.stop_recording()
+        log = ScpiLog(path)
+        self.channel.device = RecordingDevice(self.device, log)  # type: ignore
+        return log
+
+    def stop_recording(self) -> None:
+        device = self.channel.device
+        if isinstance(device, RecordingDevice):
+            device.log.close()
+            self.channel.device = self.device
+
+    async def __aenter__(self) -> 'N9010ASession':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.disconnect()
+
+    def is_connected(self) -> bool:
+        return self.device.is_connected()
+
+    async def connect(self, ip: str | None = None,
+                      port: int | None = None) -> bool:
+        self.ip = ip or self.ip
+        self.port = port or self.port
+        self.invalidate()
+        await self.channel.close()
+        return await self.device.connect(self.ip, self.port, False)
+
+    async def disconnect(self) -> None:
+        await self.channel.close()
+        await self.device.disconnect()
+
+    def enable_metrics(self, metrics: CommandMetrics | None = None) -> CommandMetrics:
+        """Starts recording per-command latency. Returns the metrics."""
+        self.metrics = metrics or self.metrics or CommandMetrics()
+        self.channel.metrics = self.metrics
+        return self.metrics
+
+    def disable_metrics(self) -> None:
+        self.metrics = None
+        self.channel.metrics = None
+
+    def decode(self, payload: bytes, header: str = ':READ:SAN1?') -> np.ndarray:
+        """Decodes trace block, decode time is recorded if metrics are on."""
+        if self.metrics is None:
+            return decode_trace(payload, self.trace_format)
+        started: float = time.perf_counter()
+        trace: np.ndarray = decode_trace(payload, self.trace_format)
+        self.metrics.record_decode(header, time.perf_counter() - started)
+        return trace
+
+    def invalidate(self) -> None:
+        """Drops cached instrument settings, e.g. after front panel use."""
+        if self.state:
+            self.state.clear()
+
+    async def send(self, cmd: bytes) -> None:
+        """Sends program message. Setters repeating cached settings are
+        dropped from it."""
+        if self.state:
+            cmd = self.state.filter_message(cmd)
+            if not cmd:
+                return
+        await self.channel.send(cmd)
+
+    async def query(self, cmd: bytes) -> bytes:
+        """Sends query and waits for its reply. Safe to call concurrently,
+        replies are matched to queries by `CommandChannel`."""
+        if self.state:
+            self.state.filter_message(cmd)
+        return await self.channel.query(cmd, 'line', self.query_timeout)
+
+    async def query_value(self, cmd: bytes) -> int | float | str:
+        if self.state:
+            cached = self.state.lookup(cmd)
+            if cached is not None:
+                return cached
+        value = parse_scalar(await self.query(cmd))
+        if self.state:
+            self.state.store(cmd, value)
+        return value
+
+    async def execute(self, batch: CommandBatch) -> list[bytes]:
+        """Sends the batch by one write. If the batch has queries, reads one
+        compound response and returns answers in order of the queries."""
+        if not len(batch):
+            return []
+        if not batch.queries_amount:
+            await self.send(batch.encode())
+            return []
+        queries: list[bytes] = [cmd for cmd in batch.commands
+                                if b'?' in cmd.split(b' ', 1)[0]]
+        if self.state:
+            # Setters may change coupled settings (start changes span), so
+            # only pure query batches are answered from the cache.
+            if len(queries) == len(batch.commands):
+                cached = [self.state.lookup(query) for query in queries]
+                if all(value is not None for value in cached):
+                    return [str(value).encode('ascii') for value in cached]
+            message: bytes = self.state.filter_message(batch.encode())
+        else:
+            message = batch.encode()
+        answers: list[bytes] = batch.split_answer(
+            await self.channel.query(message, 'line', self.query_timeout))
+        if self.state:
+            for query, answer in zip(queries, answers):
+                self.state.store(query, parse_scalar(answer))
+        return answers
+
+    async def identify(self) -> str:
+        return (await self.query(self.api.identification_query())).decode().strip()
+
+    async def initialize(self) -> AnalyzerConfig:
+        """Switches the instrument to the swept SA mode with single sweeps,
+        max hold trace and binary traces in `trace_format`, and reads back
+        current configuration."""
+        await self.execute(CommandBatch(self.api.set_mode('SA'),
+                                        self.api.set_data_format(self.trace_format),
+                                        self.api.set_byte_order('NORM'),
+                                        self.api.set_averaging(True)))
+        config: AnalyzerConfig = await self.read_config()
+        await self.execute(CommandBatch(self.api.set_continuous_sweep(False),
+                                        self.api.set_trace_type(1, 'MAXH')))
+        return config
+
+    async def read_config(self) -> AnalyzerConfig:
+        """Reads back sweep configuration by one compound query."""
+        batch = CommandBatch(self.api.get_center_freq(),
+                             self.api.get_freq_span(),
+                             self.api.get_start_freq(),
+                             self.api.get_stop_freq(),
+                             self.api.get_threshold(),
+                             self.api.get_points_amount(),
+                             self.api.get_res_bandwidth(),
+                             self.api.get_video_bandwidth(),
+                             self.api.get_averaging_amount(),
+                             self.api.get_mech_attenuation_auto_status(),
+                             self.api.get_mech_attenuation(),
+                             self.api.get_electronic_attenuation())
+        values = [parse_scalar(answer) for answer in await self.execute(batch)]
+        center, span, start, stop, threshold, points, rbw, vbw, \
+            aver_amount, mech_auto, mech, elec = values
+        self.config = AnalyzerConfig(center_freq=center, span=span,  # type: ignore
+                                     start_freq=start, stop_freq=stop,  # type: ignore
+                                     threshold=threshold, points=points,  # type: ignore
+                                     rbw=rbw, vbw=vbw,  # type: ignore
+                                     aver_amount=aver_amount,  # type: ignore
+                                     mech_att_auto=bool(mech_auto),
+                                     mech_att=mech, elec_att=elec)  # type: ignore
+        return self.config
+
+    def configure_batch(self, points: int | None = None,
+                        rbw: int | None = None,
+                        vbw: int | None = None,
+                        aver_amount: int | None = None,
+                        start_freq: int | None = None,
+                        stop_freq: int | None = None) -> CommandBatch:
+        batch = CommandBatch()
+        if points is not None:
+            batch.add(self.api.set_points_amount(points))
+        if rbw is not None:
+            batch.add(self.api.set_res_bandwidth(rbw, 'HZ'))
+        if vbw is not None:
+            batch.add(self.api.set_video_bandwidth(vbw, 'HZ'))
+        if aver_amount is not None:
+            batch.add(self.api.set_averaging(True))
+            batch.add(self.api.set_averaging_amount(aver_amount))
+        if start_freq is not None:
+            batch.add(self.api.set_start_freq(start_freq, 'HZ'))
+        if stop_freq is not None:
+            batch.add(self.api.set_stop_freq(stop_freq, 'HZ'))
+        return batch
+
+    async def configure(self, points: int | None = None,
+                        rbw: int | None = None,
+                        vbw: int | None = None,
+                        aver_amount: int | None = None,
+                        start_freq: int | None = None,
+                        stop_freq: int | None = None) -> None:
+        """Sends only given sweep parameters by one write. Frequencies and
+        bandwidths are in Hz."""
+        await self.execute(self.configure_batch(points, rbw, vbw, aver_amount,
+                                                start_freq, stop_freq))
+
+    async def request_sweep(self, start_freq: int | None = None,
+                            stop_freq: int | None = None,
+                            fetch: bool = False) -> asyncio.Future[bytes]:
+        """Sends frequency setup and `:READ:SAN?` (or `:FETC:SAN?`) by one
+        write without waiting for the trace. Returns future of trace block."""
+        batch: CommandBatch = self.configure_batch(start_freq=start_freq,
+                                                   stop_freq=stop_freq)
+        batch.add(self.api.fetch_san(1) if fetch else self.api.read_san(1))
+        message: bytes = batch.encode()
+        if self.state:
+            message = self.state.filter_message(message)
+        return await self.channel.send(message, 'block')
+
+    async def receive_sweep(self, request: asyncio.Future[bytes]) -> bytes:
+        """Waits for the trace block requested by `request_sweep`."""
+        return await self.channel.wait(request, self.sweep_timeout)
+
+    async def expected_sweep_time(self) -> float:
+        """Returns `:SWE:TIME?` multiplied by averaging count if averaging
+        is on. Values are usually served by the state cache."""
+        batch = CommandBatch(self.api.get_sweep_time(),
+                             self.api.get_averaging(),
+                             self.api.get_averaging_amount())
+        sweep_time, averaging, count = [parse_scalar(answer)
+                                        for answer in await self.execute(batch)]
+        return float(sweep_time) * (int(count) if int(averaging) else 1)
+
+    async def update_sweep_timeout(self) -> float:
+        """Adapts trace timeout to the current sweep settings."""
+        expected: float = await self.expected_sweep_time()
+        self.sweep_timeout = expected * 1.5 + self.sweep_margin
+        return self.sweep_timeout
+
+    async def wait_complete(self, poll: bool = False,
+                            timeout: float | None = None) -> None:
+        """Waits until overlapped operations (e.g. sweep started by
+        `:INIT:IMM`) are completed. By default blocks on `*OPC?`. With `poll`
+        sets `*OPC` and polls `*ESR?` starting near the expected sweep end
+        with growing interval, so other queries can run meanwhile."""
+        expected: float = await self.expected_sweep_time()
+        if timeout is None:
+            timeout = expected * 1.5 + self.sweep_margin
+        if not poll:
+            await self.channel.query(self.api.operation_complete_query(),
+                                     'line', timeout)
+            return
+        loop = asyncio.get_running_loop()
+        deadline: float = loop.time() + timeout
+        await self.send(CommandBatch(self.api.clear_status(),
+                                     self.api.operation_complete()).encode())
+        await asyncio.sleep(expected * 0.9)
+        interval: float = max(expected * 0.05, 0.005)
+        while not int(parse_scalar(await self.query(self.api.event_status_register()))) & 1:
+            if loop.time() > deadline:
+                raise TimeoutError('Operation was not completed')
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, 0.5)
+
+    async def restart(self, wait: bool = True, poll: bool = False,
+                      measurement: bool = False) -> None:
+        """Starts new sweep by `:INIT:IMM` (or the whole measurement by
+        `:INIT:REST` with `measurement`, resetting averages and hold
+        traces) and optionally waits for its end."""
+        await self.send(self.api.restart_measure() if measurement
+                        else self.api.restart_sweep())
+        if wait:
+            await self.wait_complete(poll)
+
+    async def sweep(self) -> np.ndarray:
+        """Runs single sweep and returns structured (freq, ampl) trace."""
+        await self.update_sweep_timeout()
+        return self.decode(await self.receive_sweep(await self.request_sweep()))
+
+    async def stitch(self, from_hz: int, to_hz: int, step_hz: int,
+                     progress: StitchingProgress | None = None,
+                     writer: TraceWriter | None = None,
+                     points: int | None = None) -> np.ndarray:
+        """Sweeps the range by `step_hz` wide segments and concatenates
+        segment traces. `progress` is called with done segments, total
+        segments and segments per second. With `writer` segments are
+        streamed to disk instead of memory."""
+        return await StitchingEngine([self]).run(from_hz, to_hz, step_hz,
+                                                 progress, points, writer)
+
+    async def plan_stitch(self, from_hz: int, to_hz: int,
+                          rbw: int | None = None,
+                          latency: float = 0.05) -> SegmentPlan:
+        """Plans segments for the range. Current `:SWE:POIN` is used as
+        points budget of one sweep, RBW is read from the analyzer if not
+        given."""
+        batch = CommandBatch(self.api.get_points_amount(),
+                             self.api.get_res_bandwidth(),
+                             self.api.get_video_bandwidth(),
+                             self.api.get_averaging(),
+                             self.api.get_averaging_amount())
+        points, current_rbw, vbw, averaging, count = [
+            parse_scalar(answer) for answer in await self.execute(batch)
+        ]
+        return plan_segments(from_hz, to_hz, int(rbw or current_rbw),  # type: ignore
+                             int(points), int(vbw),  # type: ignore
+                             averages=int(count) if int(averaging) else 1,  # type: ignore
+                             latency=latency)
+
+    async def stitch_adaptive(self, from_hz: int, to_hz: int,
+                              rbw: int | None = None,
+                              progress: StitchingProgress | None = None,
+                              writer: TraceWriter | None = None) -> np.ndarray:
+        """Like `stitch`, but segment span and points are chosen by
+        `plan_segments` for the RBW. The plan is printed before sweeping."""
+        plan: SegmentPlan = await self.plan_stitch(from_hz, to_hz, rbw)
+        print(f'Stitching plan: {plan}')
+        return await StitchingEngine([self]).run_plan(plan, progress, writer)
+
+    async def peaks(self, threshold: int, excursion: int,
+                    order: Literal['AMPL', 'FREQ', 'TIME'] = 'AMPL',
+                    peaks: Literal['ALL', 'GTDL', 'LTDL'] = 'ALL') -> np.ndarray:
+        """Queries peaks of the current trace. Returns (N, 2) array of
+        (amplitude, frequency) pairs."""
+        cmd: bytes = self.api.calculate_peaks(1, threshold, excursion, order, peaks)
+        answer: bytes = await self.query(cmd)
+        if self.metrics is None:
+            return parse_peak_list(answer)
+        started: float = time.perf_counter()
+        result: np.ndarray = parse_peak_list(answer)
+        self.metrics.record_decode(':CALC:DATA1:PEAK?', time.perf_counter() - started)
+        return result
@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import numpy as np
+from n9010a_controller.peaks import find_peaks
+from n9010a_controller.scpi_parser import canonical_header, split_message
+from n9010a_controller.trace_decoder import trace_dtype
+
+
+_UNITS: dict[str, float] = {'HZ': 1, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9}
+_DEFAULTS: dict[str, float | str] = {
+    ':FREQ:STAR': 1e9,
+    ':FREQ:STOP': 2e9,
+    ':BAND': 1e6,
+    ':BAND:VID': 1e6,
+    ':SWE:POIN': 1001,
+    ':AVER': 0,
+    ':AVER:COUN': 10,
+    ':POW:ATT': 10,
+    ':POW:ATT:AUTO': 1,
+    ':POW:EATT': 0,
+    ':CALC:MARK:PEAK:THR': -90,
+    ':INIT:CONT': 1,
+    ':TRAC:TYPE': 'WRIT',
+    ':INST': 'SA',
+    ':FORM': 'REAL,32',
+    ':FORM:BORD': 'NORM',
+    ':MMEM:STOR:SCR:THEM': 'TDC',
+}
+_SAMPLE_TYPES: dict[str, str] = {'REAL,32': 'REAL,32', 'REAL': 'REAL,32',
+                                 'REAL,64': 'REAL,64', 'INT,32': 'INT,32'}
+
+
+def block(payload: bytes) -> bytes:
+    """Wraps payload into IEEE 488.2 definite length block."""
+    length: bytes = str(len(payload)).encode('ascii')
+    return b'#' + str(len(length)).encode('ascii') + length + payload
+
+
+class SimulatedN9010A:
+    """Local stand-in of N9010A for offline tests and benchmarks. Implements
+    the SCPI subset generated by `N9010A_API`: frequency, bandwidth, points,
+    attenuation and averaging setters and getters, `:READ:SAN?` and
+    `:FETC:SAN?` binary traces, `:CALC:DATA:PEAK?`, in-memory mass storage
+    (`:MMEM:STOR:SCR`, `:MMEM:CAT?`, `:MMEM:DATA?`) and common commands.
+    `latency` is added before each response and `bandwidth` (bytes/s)
+    limits response transfer rate."""
+    def __init__(self, latency: float = 0, bandwidth: float = 0,
+                 sweep_time: float = 0,
+                 tones: list[tuple[float, float]] | None = None,
+                 noise_floor: float = -95, seed: int = 0) -> None:
+        self.latency: float = latency
+        self.bandwidth: float = bandwidth
+        self.sweep_time: float = sweep_time
+        self.tones: list[tuple[float, float]] = tones or [(1.5e9, -20),
+                                                          (2.4e9, -35),
+                                                          (5.8e9, -50)]
+        self.noise_floor: float = noise_floor
+        self.rng = np.random.default_rng(seed)
+        self.state: dict[str, float | str] = dict(_DEFAULTS)
+        self.errors: list[str] = []
+        self.files: dict[str, bytes] = {}
+        self.esr: int = 0
+        self.commands_count: int = 0
+        self.bytes_sent: int = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        """Starts listening and returns the bound port."""
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self, host: str = '0.0.0.0', port: int = 5025) -> None:
+        await self.start(host, port)
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                answers: list[bytes] = []
+                for cmd in split_message(line.decode('ascii')):
+                    try:
+                        answer: bytes | None = await self._execute(cmd)
+                    except (ValueError, KeyError) as err:
+                        self.errors.append(f'-113,"Undefined header;{err}"')
+                        continue
+                    if answer is not None:
+                        answers.append(answer)
+                if answers:
+                    await self._respond(writer, b';'.join(answers) + b'\n')
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not self.bandwidth:
+            writer.write(data)
+            await writer.drain()
+        else:
+            chunk: int = max(int(self.bandwidth / 100), 1)
+            for start in range(0, len(data), chunk):
+                writer.write(data[start: start + chunk])
+                await writer.drain()
+                await asyncio.sleep(len(data[start: start + chunk]) / self.bandwidth)
+        self.bytes_sent += len(data)
+
+    async def _execute(self, cmd: str) -> bytes | None:
+        header, _, args = cmd.partition(' ')
+        header = canonical_header(header)
+        if header in (':READ:SAN?', ':INIT:IMM', ':INIT:REST') and self.sweep_time:
+            await asyncio.sleep(self.sweep_time)
+        return self.handle_command(header, args.strip())
+
+    def handle_command(self, header: str, args: str = '') -> bytes | None:
+        """Executes one command with canonical header. Returns answer
+        without terminator for queries."""
+        self.commands_count += 1
+        if header == '*IDN?':
+            return b'Agilent Technologies,N9010A,SIMULATED,A.00.00'
+        if header == '*OPC?':
+            return b'1'
+        if header == ':SYST:ERR?':
+            error: str = self.errors.pop(0) if self.errors else '+0,"No error"'
+            return error.encode('ascii')
+        if header == '*CLS':
+            self.errors.clear()
+            self.esr = 0
+            return None
+        if header == '*OPC':
+            self.esr |= 1
+            return None
+        if header == '*ESR?':
+            esr, self.esr = self.esr, 0
+            return str(esr).encode('ascii')
+        if header == ':STAT:OPER:COND?':
+            return b'0'
+        if header == '*RST':
+            self.state = dict(_DEFAULTS)
+            return None
+        if header in ('*WAI', '*ABOR', ':INIT:IMM', ':INIT:REST',
+                      ':INIT:SAN', ':MMEM:MDIR', ':SYST:PDOW'):
+            return None
+        if header == ':MMEM:STOR:SCR':
+            # PNG signature followed by noise in place of an image.
+            image: bytes = self.rng.integers(0, 256, 200_000, np.uint8).tobytes()
+            self.files[self._path(args)] = b'\x89PNG\r\n\x1a\n' + image
+            return None
+        if header == ':MMEM:CAT?':
+            return self._catalog(self._path(args))
+        if header == ':MMEM:DATA?':
+            return block(self._file(self._path(args)))
+        if header in (':READ:SAN?', ':FETC:SAN?'):
+            return block(self.trace().tobytes())
+        if header == ':CALC:DATA:PEAK?':
+            return self._peaks(args)
+        if header == ':SWE:TIME?':
+            return f'{self.expected_sweep_time():.6E}'.encode('ascii')
+        if header.endswith('?'):
+            return self._get(header[:-1])
+        self._set(header, args)
+        return None
+
+    def _get(self, header: str) -> bytes:
+        if header == ':FREQ:CENT':
+            value: float | str = self._center()
+        elif header == ':FREQ:SPAN':
+            value = self._span()
+        elif header in self.state:
+            value = self.state[header]
+        else:
+            raise ValueError(f'Unsupported query: {header}?')
+        if isinstance(value, str):
+            return value.encode('ascii')
+        if float(value).is_integer() and header not in (':FREQ:STAR', ':FREQ:STOP',
+                                                        ':FREQ:CENT', ':FREQ:SPAN',
+                                                        ':BAND', ':BAND:VID'):
+            return str(int(value)).encode('ascii')
+        return f'{value:+.11E}'.encode('ascii')
+
+    def _set(self, header: str, args: str) -> None:
+        value: float | str = self._parse_value(header, args)
+        if header == ':FREQ:CENT':
+            span: float = self._span()
+            self.state[':FREQ:STAR'] = float(value) - span / 2
+            self.state[':FREQ:STOP'] = float(value) + span / 2
+        elif header == ':FREQ:SPAN':
+            center: float = self._center()
+            self.state[':FREQ:STAR'] = center - float(value) / 2
+            self.state[':FREQ:STOP'] = center + float(value) / 2
+        else:
+            self.state[header] = value
+
+    @staticmethod
+    def _parse_value(header: str, args: str) -> float | str:
+        if header == ':FORM':
+            return _SAMPLE_TYPES[args.replace(' ', '').upper()]
+        words: list[str] = args.split()
+        if not words:
+            raise ValueError(f'Missing value for {header}')
+        if words[0].upper() in ('ON', 'OFF'):
+            return float(words[0].upper() == 'ON')
+        try:
+            number: float = float(words[0])
+        except ValueError:
+            return args.strip('"')
+        if len(words) > 1:
+            number *= _UNITS[words[1].upper()]
+        return number
+
+    def _center(self) -> float:
+        return (float(self.state[':FREQ:STAR']) + float(self.state[':FREQ:STOP'])) / 2
+
+    def _span(self) -> float:
+        return float(self.state[':FREQ:STOP']) - float(self.state[':FREQ:STAR'])
+
+    def expected_sweep_time(self) -> float:
+        if self.sweep_time:
+            return self.sweep_time
+        rbw: float = float(self.state[':BAND'])
+        return max(2.5 * self._span() / rbw ** 2, 1e-3)
+
+    def spectrum(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns simulated frequency and amplitude of current sweep."""
+        points: int = int(self.state[':SWE:POIN'])
+        freq: np.ndarray = np.linspace(float(self.state[':FREQ:STAR']),
+                                       float(self.state[':FREQ:STOP']), points)
+        ampl: np.ndarray = self.noise_floor + self.rng.normal(0, 1.5, points)
+        half_rbw: float = float(self.state[':BAND']) / 2
+        for tone_freq, tone_ampl in self.tones:
+            tone: np.ndarray = tone_ampl - 3 * ((freq - tone_freq) / half_rbw) ** 2
+            np.maximum(ampl, tone, out=ampl)
+        return freq, ampl
+
+    def trace(self) -> np.ndarray:
+        freq, ampl = self.spectrum()
+        result = np.empty(len(freq), dtype=trace_dtype(self.state[':FORM']))  # type: ignore
+        result['freq'] = freq
+        result['ampl'] = ampl
+        return result
+
+    @staticmethod
+    def _path(args: str) -> str:
+        return args.strip().strip('"').replace('/', '\\').rstrip('\\')
+
+    def _file(self, path: str) -> bytes:
+        """Mass storage of the instrument is case insensitive."""
+        for name, data in self.files.items():
+            if name.upper() == path.upper():
+                return data
+        raise KeyError(path)
+
+    def _catalog(self, directory: str) -> bytes:
+        entries: list[str] = []
+        for path, data in self.files.items():
+            parent, _, name = path.rpartition('\\')
+            if parent.upper() == directory.upper():
+                entries.append(f'"{name},,{len(data)}"')
+        used: int = sum(map(len, self.files.values()))
+        return ','.join([str(used), str(2 ** 30 - used), *entries]).encode('ascii')
+
+    def _peaks(self, args: str) -> bytes:
+        params: list[str] = [arg.strip() for arg in args.split(',')]
+        threshold: float = float(params[0]) if params and params[0] else -90
+        excursion: float = float(params[1]) if len(params) > 1 else 6
+        order: str = params[2].upper() if len(params) > 2 else 'AMPL'
+        result: np.ndarray = find_peaks(self.trace(), threshold, excursion,
+                                        order)  # type: ignore
+        values: str = ','.join(f'{ampl:.6E},{freq:.8E}' for ampl, freq in result)
+        answer: str = f'{len(result)}' + (f',{values}' if values else '')
+        return answer.encode('ascii')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Simulated N9010A SCPI server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5025)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--bandwidth', type=float, default=0)
+    parser.add_argument('--sweep-time', type=float, default=0)
+    args = parser.parse_args()
+    simulator = SimulatedN9010A(args.latency, args.bandwidth, args.sweep_time)
+    asyncio.run(simulator.serve_forever(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
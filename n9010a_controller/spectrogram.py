@@ -0,0 +1,247 @@
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Literal
+import numpy as np
+
+
+Stat = Literal['min', 'max', 'mean']
+STATS: tuple[Stat, ...] = ('min', 'max', 'mean')
+VALUE_DTYPE: np.dtype = np.dtype('<f4')
+TIME_DTYPE: np.dtype = np.dtype('<f8')
+
+
+def regrid(trace: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Resamples structured (freq, ampl) trace onto archive bins given by
+    `edges`. Bins with several samples keep their maximum (so narrow
+    emissions survive), empty bins inside the trace are interpolated and
+    bins outside the trace are NaN."""
+    freq: np.ndarray = np.asarray(trace['freq'], dtype=np.float64)
+    ampl: np.ndarray = np.asarray(trace['ampl'], dtype=np.float32)
+    row: np.ndarray = np.full(len(edges) - 1, np.nan, dtype=VALUE_DTYPE)
+    if not len(freq):
+        return row
+    bounds: np.ndarray = np.searchsorted(freq, edges)
+    filled: np.ndarray = bounds[1:] > bounds[:-1]
+    if filled.any():
+        row[filled] = np.maximum.reduceat(ampl[:bounds[-1]], bounds[:-1][filled])
+    centers: np.ndarray = (edges[1:] + edges[:-1]) / 2
+    empty: np.ndarray = ~filled & (centers >= freq[0]) & (centers <= freq[-1])
+    if empty.any():
+        row[empty] = np.interp(centers[empty], freq, ampl)
+    return row
+
+
+def _reduce(values: np.ndarray, stat: Stat) -> np.ndarray:
+    """NaN ignoring reduction of (cells, samples) array along samples,
+    all-NaN cells stay NaN."""
+    if stat == 'min':
+        return np.fmin.reduce(values, axis=1)
+    if stat == 'max':
+        return np.fmax.reduce(values, axis=1)
+    valid: np.ndarray = ~np.isnan(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (np.where(valid, values, 0).sum(axis=1)
+                / valid.sum(axis=1)).astype(VALUE_DTYPE)
+
+
+class SpectrogramArchive:
+    """Append-only time x frequency store for long monitoring runs. Every
+    sweep (single or stitched) is resampled onto the fixed frequency grid
+    of the archive and appended as one float32 row of level 0. Each level
+    k > 0 holds min, max and mean of `time_factor` x `freq_factor` cells of
+    level k - 1, written as soon as its block of rows is complete. Queries
+    over long intervals and wide bands read coarse levels and only the
+    newest rows not covered by them from level 0. Row counts are derived
+    from file sizes, so an interrupted run keeps all complete rows."""
+    def __init__(self, path: Path | str, freq_start: float | None = None,
+                 freq_stop: float | None = None, bins: int | None = None,
+                 time_factor: int = 16, freq_factor: int = 4,
+                 levels: int = 4) -> None:
+        self.path: Path = Path(path)
+        meta_path: Path = self.path / 'meta.json'
+        if meta_path.exists():
+            meta: dict[str, Any] = json.loads(meta_path.read_text())
+        else:
+            if freq_start is None or freq_stop is None or not bins:
+                raise ValueError('Frequency grid is required for a new archive')
+            unit: int = freq_factor ** levels
+            meta = {'freq_start': freq_start, 'freq_stop': freq_stop,
+                    'bins': math.ceil(bins / unit) * unit,
+                    'time_factor': time_factor, 'freq_factor': freq_factor,
+                    'levels': levels}
+            self.path.mkdir(parents=True, exist_ok=True)
+            meta_path.write_text(json.dumps(meta, indent=2))
+        self.freq_start: float = meta['freq_start']
+        self.freq_stop: float = meta['freq_stop']
+        self.bins: int = meta['bins']
+        self.time_factor: int = meta['time_factor']
+        self.freq_factor: int = meta['freq_factor']
+        self.levels: int = meta['levels']
+        self.edges: np.ndarray = np.linspace(self.freq_start, self.freq_stop,
+                                             self.bins + 1)
+
+    @classmethod
+    def for_trace(cls, path: Path | str, trace: np.ndarray,
+                  **kwargs) -> 'SpectrogramArchive':
+        """Opens the archive or creates it with the grid of `trace`."""
+        if (Path(path) / 'meta.json').exists():
+            return cls(path)
+        return cls(path, float(trace['freq'][0]), float(trace['freq'][-1]),
+                   len(trace), **kwargs)
+
+    def _file(self, level: int, stat: Stat | None = None) -> Path:
+        if level == 0 or stat is None:
+            suffix: str = '_times.f8' if stat is None else '.f4'
+            return self.path / f'level{level}{suffix}'
+        return self.path / f'level{level}_{stat}.f4'
+
+    def level_bins(self, level: int) -> int:
+        return self.bins // self.freq_factor ** level
+
+    def rows(self, level: int) -> int:
+        """Complete rows of the level (the smallest of its files)."""
+        row_size: int = self.level_bins(level) * VALUE_DTYPE.itemsize
+        stats: tuple[Stat, ...] = ('max',) if level == 0 else STATS
+        sizes: list[int] = [self._size(self._file(level, stat)) // row_size
+                            for stat in stats]
+        sizes.append(self._size(self._file(level)) // (2 * TIME_DTYPE.itemsize))
+        return min(sizes)
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        return path.stat().st_size if path.exists() else 0
+
+    def values(self, level: int, stat: Stat = 'max') -> np.ndarray:
+        """Memory mapped (rows, bins) array of the level."""
+        rows: int = self.rows(level)
+        if not rows:
+            return np.empty((0, self.level_bins(level)), dtype=VALUE_DTYPE)
+        return np.memmap(self._file(level, stat), dtype=VALUE_DTYPE, mode='r',
+                         shape=(rows, self.level_bins(level)))
+
+    def times(self, level: int) -> np.ndarray:
+        """(rows, 2) array of first and last sweep timestamps of each row."""
+        rows: int = self.rows(level)
+        if not rows:
+            return np.empty((0, 2), dtype=TIME_DTYPE)
+        return np.memmap(self._file(level), dtype=TIME_DTYPE, mode='r',
+                         shape=(rows, 2))
+
+    def freqs(self, level: int) -> np.ndarray:
+        """Centers of the level frequency bins."""
+        edges: np.ndarray = self.edges[::self.freq_factor ** level]
+        return (edges[1:] + edges[:-1]) / 2
+
+    def ingest(self, trace: np.ndarray, timestamp: float | None = None) -> None:
+        """Appends structured (freq, ampl) trace, e.g. `_single_sweep`
+        result or a stitched scan, and completes pyramid blocks."""
+        timestamp = time.time() if timestamp is None else timestamp
+        row: np.ndarray = regrid(trace, self.edges)
+        self._append(0, {'max': row}, np.array([timestamp, timestamp]))
+        for level in range(1, self.levels + 1):
+            below: int = self.rows(level - 1)
+            if below % self.time_factor or below // self.time_factor <= self.rows(level):
+                break
+            self._build_block(level, below)
+
+    def _append(self, level: int, rows: dict[Stat, np.ndarray],
+                times: np.ndarray) -> None:
+        for stat, values in rows.items():
+            with self._file(level, stat).open('ab') as file:
+                values.astype(VALUE_DTYPE, copy=False).tofile(file)
+        with self._file(level).open('ab') as file:
+            times.astype(TIME_DTYPE, copy=False).tofile(file)
+
+    def _build_block(self, level: int, below: int) -> None:
+        start: int = below - self.time_factor
+        times: np.ndarray = self.times(level - 1)[start:below]
+        block: dict[Stat, np.ndarray] = {}
+        for stat in STATS:
+            values: np.ndarray = self.values(level - 1, 'max' if level == 1 else stat)
+            cells: np.ndarray = np.asarray(values[start:below]).reshape(
+                self.time_factor, -1, self.freq_factor).transpose(1, 0, 2)
+            block[stat] = _reduce(cells.reshape(len(cells), -1), stat)
+        self._append(level, block, np.array([times[0, 0], times[-1, 1]]))
+
+    def select_level(self, t_from: float, t_to: float, f_from: float,
+                     f_to: float, min_cells: int = 8) -> int:
+        """Coarsest level which still has about `min_cells` rows and bins
+        inside the requested interval and band."""
+        bin_width: float = (self.freq_stop - self.freq_start) / self.bins
+        base_times: np.ndarray = self.times(0)
+        period: float = (float(np.diff(base_times[:, 0]).mean())
+                         if len(base_times) > 1 else 1)
+        level: int = 0
+        while level < self.levels:
+            scale: int = level + 1
+            if (t_to - t_from) / (period * self.time_factor ** scale) < min_cells:
+                break
+            if (f_to - f_from) / (bin_width * self.freq_factor ** scale) < min_cells:
+                break
+            if not self.rows(scale):
+                break
+            level = scale
+        return level
+
+    def _band(self, level: int, f_from: float, f_to: float) -> slice:
+        edges: np.ndarray = self.edges[::self.freq_factor ** level]
+        first: int = max(int(np.searchsorted(edges, f_from, 'right')) - 1, 0)
+        last: int = int(np.searchsorted(edges, f_to, 'left'))
+        return slice(first, max(last, first + 1))
+
+    def spectrogram(self, t_from: float, t_to: float, f_from: float,
+                    f_to: float, stat: Stat = 'max',
+                    level: int | None = None
+                    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns row timestamps, bin frequencies and (rows, bins) values
+        of one level for waterfall display. Cells crossing the interval
+        edges are included."""
+        if level is None:
+            level = self.select_level(t_from, t_to, f_from, f_to)
+        times: np.ndarray = self.times(level)
+        rows: np.ndarray = np.flatnonzero((times[:, 1] >= t_from) & (times[:, 0] <= t_to))
+        band: slice = self._band(level, f_from, f_to)
+        if not len(rows):
+            return (np.empty(0), self.freqs(level)[band],
+                    np.empty((0, band.stop - band.start), dtype=VALUE_DTYPE))
+        rows_slice = slice(rows[0], rows[-1] + 1)
+        values: np.ndarray = self.values(level, 'max' if level == 0 else stat)
+        return (np.asarray(times[rows_slice, 0]), self.freqs(level)[band],
+                np.asarray(values[rows_slice, band]))
+
+    def aggregate(self, t_from: float, t_to: float, f_from: float,
+                  f_to: float, stat: Stat = 'max') -> float:
+        """Min, max or mean over the interval and band, e.g. max over ten
+        minutes between 2.40 and 2.48 GHz. Uses the coarse level chosen
+        by `select_level` and level 0 for the newest rows not aggregated
+        yet. Coarse cells crossing the edges are included, so the result
+        may cover slightly more than requested."""
+        level: int = self.select_level(t_from, t_to, f_from, f_to)
+        parts: list[np.ndarray] = []
+        weights: list[np.ndarray] = []
+        _, _, coarse = self.spectrogram(t_from, t_to, f_from, f_to, stat, level)
+        parts.append(coarse.ravel())
+        cell: int = (self.time_factor * self.freq_factor) ** level
+        weights.append(np.full(coarse.size, cell))
+        if level:
+            covered: int = self.rows(level) * self.time_factor ** level
+            times: np.ndarray = self.times(0)[covered:]
+            rows: np.ndarray = np.flatnonzero((times[:, 0] >= t_from) & (times[:, 0] <= t_to))
+            if len(rows):
+                tail: np.ndarray = np.asarray(
+                    self.values(0)[covered + rows[0]: covered + rows[-1] + 1,
+                                   self._band(0, f_from, f_to)])
+                parts.append(tail.ravel())
+                weights.append(np.ones(tail.size))
+        values: np.ndarray = np.concatenate(parts)
+        weight: np.ndarray = np.concatenate(weights)
+        valid: np.ndarray = ~np.isnan(values)
+        if not valid.any():
+            return math.nan
+        if stat == 'min':
+            return float(values[valid].min())
+        if stat == 'max':
+            return float(values[valid].max())
+        return float(np.average(values[valid], weights=weight[valid]))
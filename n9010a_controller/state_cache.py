@@ -0,0 +1,158 @@
+from n9010a_controller.scpi_parser import (canonical_header, parse_scalar,
+                                           split_message)
+
+
+Value = int | float | str
+
+CACHEABLE: set[str] = {
+    ':FREQ:STAR', ':FREQ:STOP', ':FREQ:CENT', ':FREQ:SPAN',
+    ':BAND', ':BAND:VID', ':SWE:POIN', ':SWE:TIME',
+    ':BAND:AUTO', ':BAND:VID:AUTO', ':SWE:TIME:AUTO',
+    ':POW:ATT', ':POW:ATT:AUTO', ':POW:EATT',
+    ':AVER', ':AVER:COUN', ':CALC:MARK:PEAK:THR',
+    ':INIT:CONT', ':TRAC:TYPE', ':FORM', ':FORM:BORD', ':MMEM:STOR:SCR:THEM',
+}
+# Commands which don't change cached settings.
+NEUTRAL: set[str] = {
+    ':INIT:IMM', ':INIT:REST', ':INIT:SAN', '*WAI', '*OPC', '*CLS', '*ABOR',
+    ':MMEM:STOR:SCR', ':MMEM:MDIR', ':CALC:MARK:CPS', ':CALC:MARK:PEAK:TABL:STAT',
+}
+# Settings the instrument recalculates when the key setting changes.
+COUPLED: dict[str, tuple[str, ...]] = {
+    ':FREQ:STAR': (':FREQ:CENT', ':FREQ:SPAN', ':BAND', ':BAND:VID', ':SWE:TIME'),
+    ':FREQ:STOP': (':FREQ:CENT', ':FREQ:SPAN', ':BAND', ':BAND:VID', ':SWE:TIME'),
+    ':FREQ:CENT': (':FREQ:STAR', ':FREQ:STOP'),
+    ':FREQ:SPAN': (':FREQ:STAR', ':FREQ:STOP', ':BAND', ':BAND:VID', ':SWE:TIME'),
+    ':BAND': (':BAND:VID', ':SWE:TIME'),
+    ':BAND:VID': (':SWE:TIME',),
+    ':SWE:POIN': (':SWE:TIME',),
+    ':POW:ATT:AUTO': (':POW:ATT',),
+    ':BAND:AUTO': (':BAND', ':BAND:VID', ':SWE:TIME'),
+    ':BAND:VID:AUTO': (':BAND:VID', ':SWE:TIME'),
+    ':SWE:TIME:AUTO': (':SWE:TIME',),
+    ':AVER': (':SWE:TIME',),
+    ':AVER:COUN': (':SWE:TIME',),
+}
+# Settings coupled automatically while their AUTO twin is on. Manual
+# value switches the twin off.
+AUTO: dict[str, str] = {
+    ':POW:ATT': ':POW:ATT:AUTO',
+    ':BAND': ':BAND:AUTO',
+    ':BAND:VID': ':BAND:VID:AUTO',
+    ':SWE:TIME': ':SWE:TIME:AUTO',
+}
+_UNITS: dict[str, int] = {'HZ': 1, 'KHZ': 1000, 'MHZ': 1000_000,
+                          'GHZ': 1000_000_000}
+
+
+def parse_setting(args: str) -> Value:
+    """Parses setter argument like `10 MHZ`, `ON` or `REAL,32`."""
+    words: list[str] = args.split()
+    if len(words) == 2 and words[1].upper() in _UNITS:
+        value: Value = parse_scalar(words[0])
+        if isinstance(value, (int, float)):
+            return value * _UNITS[words[1].upper()]
+    if args.upper() in ('ON', 'OFF'):
+        return int(args.upper() == 'ON')
+    return parse_scalar(args)
+
+
+class InstrumentState:
+    """Client side mirror of instrument settings keyed by SCPI header.
+    Setters repeating the cached value are suppressed, getters of cached
+    settings are served locally. Cache is cleared on `*RST`, mode change
+    and unknown commands, coupled settings are dropped on related changes
+    (e.g. start/stop vs center/span). Auto-coupled settings (RBW, VBW,
+    attenuation, sweep time) are cached only while their AUTO twin is known
+    to be OFF, otherwise the instrument may change them at any time and
+    manual setters must reach it to switch AUTO off. Values are stored as
+    sent, rounding done by the instrument (e.g. RBW steps) is not
+    mirrored."""
+    def __init__(self) -> None:
+        self.values: dict[str, Value] = {}
+        self.suppressed: int = 0
+        self.hits: int = 0
+
+    def clear(self) -> None:
+        self.values.clear()
+
+    def _auto_off(self, base: str) -> bool:
+        return base in AUTO and self.values.get(AUTO[base]) == 0
+
+    def _cacheable_value(self, base: str) -> bool:
+        return base not in AUTO or self._auto_off(base)
+
+    def _invalidate(self, base: str) -> None:
+        coupled: tuple[str, ...] = COUPLED.get(base, ())
+        for key in [key for key in self.values if canonical_header(key) in coupled
+                    and not self._auto_off(canonical_header(key))]:
+            del self.values[key]
+
+    def filter(self, cmd: str) -> str | None:
+        """Returns the command if it has to be sent or None if it repeats
+        cached value. Updates the cache."""
+        header, _, args = cmd.strip().partition(' ')
+        if header.endswith('?'):
+            return cmd
+        base: str = canonical_header(header)
+        if base in ('*RST', ':INST', ':SYST:PRES'):
+            self.clear()
+            return cmd
+        if base in NEUTRAL:
+            return cmd
+        if base not in CACHEABLE:
+            self.clear()
+            return cmd
+        key: str = canonical_header(header, False)
+        value: Value = parse_setting(args.strip())
+        if key in self.values and self.values[key] == value \
+                and self._cacheable_value(base):
+            self.suppressed += 1
+            return None
+        self._check_limits(base, value)
+        self.values[key] = value
+        if base in AUTO:
+            self.values[AUTO[base]] = 0
+        self._invalidate(base)
+        return cmd
+
+    def _check_limits(self, base: str, value: Value) -> None:
+        """Start above stop (or stop below start) moves the other edge."""
+        other: str = {':FREQ:STAR': ':FREQ:STOP',
+                      ':FREQ:STOP': ':FREQ:STAR'}.get(base, '')
+        if other not in self.values or not isinstance(value, (int, float)):
+            return
+        edge: Value = self.values[other]
+        if isinstance(edge, str) or (edge <= value if base == ':FREQ:STAR'
+                                     else edge >= value):
+            del self.values[other]
+
+    def filter_message(self, message: bytes) -> bytes:
+        """Filters every command of the program message. Returns empty bytes
+        if nothing has to be sent."""
+        commands: list[str] = [cmd for cmd in split_message(message.decode('ascii'))
+                               if self.filter(cmd) is not None]
+        return (';'.join(commands) + '\n').encode('ascii') if commands else b''
+
+    @staticmethod
+    def _query_key(query: bytes) -> str | None:
+        text: str = query.decode('ascii').strip()
+        if not text.endswith('?') or ' ' in text or ';' in text:
+            return None
+        if canonical_header(text[:-1]) not in CACHEABLE:
+            return None
+        return canonical_header(text[:-1], False)
+
+    def lookup(self, query: bytes) -> Value | None:
+        key: str | None = self._query_key(query)
+        value: Value | None = self.values.get(key) if key else None
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def store(self, query: bytes, value: Value) -> None:
+        """Caches readback value. Values of auto-coupled settings read
+        while AUTO may be on are not kept."""
+        key: str | None = self._query_key(query)
+        if key and self._cacheable_value(canonical_header(key)):
+            self.values[key] = value
@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable
+import numpy as np
+from n9010a_controller.storage import TraceWriter, load_trace, sidecar_path
+from n9010a_controller.trace_decoder import trace_dtype
+
+if TYPE_CHECKING:
+    from n9010a_controller.session import N9010ASession
+
+
+Segment = tuple[int, int]
+StitchingProgress = Callable[[int, int, float], None]
+# Swept analyzer needs about k * span / (RBW * VBW) seconds per sweep.
+SWEEP_TIME_FACTOR: float = 2.0
+
+
+def split_segments(from_hz: int, to_hz: int, step_hz: int) -> list[Segment]:
+    return [(freq, freq + step_hz) for freq in range(from_hz, to_hz, step_hz)]
+
+
+def distribute_segments(segments: list[Segment],
+                        parts: int) -> list[list[Segment]]:
+    """Splits segments into `parts` contiguous groups of nearly equal size."""
+    bounds = np.linspace(0, len(segments), parts + 1).astype(int)
+    return [segments[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+@dataclass
+class SegmentPlan:
+    segments: list[Segment]
+    points: int
+    rbw: int
+    sweep_time: float
+    latency: float
+
+    @property
+    def step(self) -> int:
+        return self.segments[0][1] - self.segments[0][0] if self.segments else 0
+
+    @property
+    def total_time(self) -> float:
+        return len(self.segments) * (self.sweep_time + self.latency)
+
+    def __str__(self) -> str:
+        return (f'{len(self.segments)} segments of {self.step} Hz, '
+                f'{self.points} points, RBW {self.rbw} Hz, '
+                f'~{self.sweep_time:.3f} s per segment, '
+                f'~{self.total_time:.1f} s total')
+
+
+def plan_segments(from_hz: int, to_hz: int, rbw: int, max_points: int,
+                  vbw: int | None = None, bins_per_rbw: float = 2,
+                  averages: int = 1, latency: float = 0.05) -> SegmentPlan:
+    """Returns the fewest equal segments which keep at least `bins_per_rbw`
+    trace bins per RBW with `max_points` per sweep. Sweep time of a segment
+    is estimated from span, RBW and VBW, `latency` is added per segment
+    for commands and trace transfer."""
+    if to_hz <= from_hz or rbw <= 0 or max_points < 2:
+        raise ValueError('Invalid stitching range, RBW or points')
+    bin_hz: float = rbw / bins_per_rbw
+    max_span: float = (max_points - 1) * bin_hz
+    amount: int = math.ceil((to_hz - from_hz) / max_span)
+    step: int = math.ceil((to_hz - from_hz) / amount)
+    points: int = min(max_points, math.ceil(step / bin_hz) + 1)
+    segments: list[Segment] = [(freq, min(freq + step, to_hz))
+                               for freq in range(from_hz, to_hz, step)]
+    video: int = min(rbw, vbw) if vbw else rbw
+    sweep_time: float = SWEEP_TIME_FACTOR * step / (rbw * video) * averages
+    return SegmentPlan(segments, points, rbw, sweep_time, latency)
+
+
+class StitchAccumulator:
+    """Collects segment traces in frequency order into one preallocated
+    structured array. Each segment is written in place, leading bins which
+    duplicate already stored frequencies (shared segment boundaries) are
+    trimmed. If capacity is exceeded the buffer grows geometrically."""
+    def __init__(self, capacity: int = 0,
+                 dtype: np.dtype | None = None) -> None:
+        self.dtype: np.dtype = dtype if dtype is not None else trace_dtype()
+        self._buffer: np.ndarray = np.empty(capacity, dtype=self.dtype)
+        self.size: int = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    def _reserve(self, size: int) -> None:
+        if size <= self.capacity:
+            return
+        buffer = np.empty(max(size, 2 * self.capacity), dtype=self.dtype)
+        buffer[:self.size] = self._buffer[:self.size]
+        self._buffer = buffer
+
+    def append(self, trace: np.ndarray) -> None:
+        if self.size:
+            last_freq = self._buffer['freq'][self.size - 1]
+            trace = trace[np.searchsorted(trace['freq'], last_freq, 'right'):]
+        self._reserve(self.size + len(trace))
+        self._buffer[self.size: self.size + len(trace)] = trace
+        self.size += len(trace)
+
+    def result(self) -> np.ndarray:
+        return self._buffer[:self.size]
+
+
+class StitchingEngine:
+    """Sweeps a wide span by segments on one or several analyzers.
+    Segment setup and `:READ:SAN?` are sent by one write, and the request
+    for the next segment is sent right after the previous trace has been
+    received, so the instrument sweeps while the host decodes. With several
+    sessions the span is split into contiguous parts swept concurrently."""
+    def __init__(self, sessions: list['N9010ASession']) -> None:
+        if not sessions:
+            raise ValueError('At least one session is required')
+        self.sessions: list['N9010ASession'] = sessions
+
+    async def run(self, from_hz: int, to_hz: int, step_hz: int,
+                  progress: StitchingProgress | None = None,
+                  points: int | None = None,
+                  writer: TraceWriter | None = None) -> np.ndarray:
+        """Returns stitched structured (freq, ampl) trace. `progress` is
+        called with done segments, total segments and segments per second.
+        `points` per segment is used to preallocate the result, it is
+        queried by `:SWE:POIN?` if not given. If `writer` is given, segments
+        are streamed to disk, writer is closed and memory mapped result is
+        returned."""
+        return await self._run_segments(split_segments(from_hz, to_hz, step_hz),
+                                        progress, points, writer)
+
+    async def run_plan(self, plan: SegmentPlan,
+                       progress: StitchingProgress | None = None,
+                       writer: TraceWriter | None = None) -> np.ndarray:
+        """Applies points and RBW of the plan on all analyzers and sweeps
+        planned segments. Previous `:SWE:POIN` is restored afterwards, so
+        it stays the points budget of the next plan."""
+        previous: list[int | float | str] = await asyncio.gather(*[
+            session.query_value(session.api.get_points_amount())
+            for session in self.sessions
+        ])
+        await asyncio.gather(*[session.configure(points=plan.points, rbw=plan.rbw)
+                               for session in self.sessions])
+        if writer is not None:
+            writer.settings.update(points=plan.points, rbw=plan.rbw)
+        try:
+            return await self._run_segments(plan.segments, progress,
+                                            plan.points, writer)
+        finally:
+            await asyncio.gather(*[session.configure(points=int(points))
+                                   for session, points
+                                   in zip(self.sessions, previous)])
+
+    async def _run_segments(self, segments: list[Segment],
+                            progress: StitchingProgress | None,
+                            points: int | None,
+                            writer: TraceWriter | None) -> np.ndarray:
+        groups = distribute_segments(segments, len(self.sessions))
+        if writer is not None:
+            return await self._run_to_file(segments, groups, writer, progress)
+        if points is None:
+            session: 'N9010ASession' = self.sessions[0]
+            points = int(await session.query_value(session.api.get_points_amount()))
+        accumulators: list[StitchAccumulator] = [
+            StitchAccumulator(len(group) * points) for group in groups
+        ]
+        await self._run_groups(groups, accumulators, progress)
+        if len(accumulators) == 1:
+            return accumulators[0].result()
+        result = StitchAccumulator(sum(map(len, accumulators)))
+        for accumulator in accumulators:
+            result.append(accumulator.result())
+        return result.result()
+
+    async def _run_to_file(self, segments: list[Segment],
+                           groups: list[list[Segment]], writer: TraceWriter,
+                           progress: StitchingProgress | None) -> np.ndarray:
+        if len(groups) == 1:
+            await self._run_groups(groups, [writer], progress)
+            writer.close()
+            return load_trace(writer.path)
+        parts: list[TraceWriter] = [
+            TraceWriter(writer.path.with_name(writer.path.name + f'.part{i}'), dtype=writer.dtype)
+            for i, _ in enumerate(groups)
+        ]
+        try:
+            await self._run_groups(groups, parts, progress)
+        finally:
+            for part in parts:
+                part.close()
+        for part in parts:
+            writer.append_file(part.path)
+            part.path.unlink()
+            sidecar_path(part.path).unlink()
+        writer.close()
+        return load_trace(writer.path)
+
+    async def _run_groups(self, groups: list[list[Segment]],
+                          sinks: list[StitchAccumulator] | list[TraceWriter],
+                          progress: StitchingProgress | None) -> None:
+        total: int = sum(map(len, groups))
+        started: float = time.perf_counter()
+        done: int = 0
+
+        def on_segment(group: int, trace: np.ndarray | None) -> None:
+            nonlocal done
+            if trace is not None:
+                sinks[group].append(trace)
+            done += 1
+            if progress:
+                elapsed: float = time.perf_counter() - started
+                progress(done, total, done / elapsed if elapsed else 0)
+
+        await asyncio.gather(*[self._run_session(session, group, i, on_segment)
+                               for i, (session, group)
+                               in enumerate(zip(self.sessions, groups))])
+
+    @staticmethod
+    async def _run_session(session: 'N9010ASession', segments: list[Segment],
+                           group: int,
+                           on_segment: Callable[[int, np.ndarray | None], None]):
+        if not segments:
+            return
+        await session.configure(start_freq=segments[0][0],
+                                stop_freq=segments[0][1])
+        await session.update_sweep_timeout()
+        request = await session.request_sweep(*segments[0])
+        for i, _ in enumerate(segments):
+            try:
+                payload: bytes | None = await session.receive_sweep(request)
+            except TimeoutError:
+                print(f'timeout on segment {segments[i][0]} Hz')
+                payload = None
+            if i + 1 < len(segments):
+                request = await session.request_sweep(*segments[i + 1])
+            on_segment(group, session.decode(payload) if payload else None)
@@ -0,0 +1,93 @@
+from datetime import datetime
+import json
+from pathlib import Path
+from typing import Any
+import numpy as np
+from n9010a_controller.trace_decoder import trace_dtype
+
+
+STORAGE_DTYPE: np.dtype = trace_dtype().newbyteorder('<')
+
+
+def sidecar_path(path: Path) -> Path:
+    # Full name is kept, so `scan.bin.part0` and `scan.bin` get own sidecars.
+    return path.with_name(path.name + '.json')
+
+
+class TraceWriter:
+    """Streams structured (freq, ampl) traces to a raw little endian binary
+    file as they arrive. Count, dtype and sweep settings (RBW, VBW, points,
+    attenuation...) are written to JSON sidecar on close. Like
+    `StitchAccumulator`, leading bins duplicating the last stored frequency
+    are trimmed, so segments can be appended directly."""
+    def __init__(self, path: Path | str, settings: dict[str, Any] | None = None,
+                 dtype: np.dtype = STORAGE_DTYPE) -> None:
+        self.path: Path = Path(path)
+        self.settings: dict[str, Any] = settings or {}
+        self.dtype: np.dtype = dtype
+        self.size: int = 0
+        self._last_freq: float | None = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open('wb')
+
+    def __enter__(self) -> 'TraceWriter':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, trace: np.ndarray) -> None:
+        if self._last_freq is not None:
+            trace = trace[np.searchsorted(trace['freq'], self._last_freq, 'right'):]
+        if not len(trace):
+            return
+        trace.astype(self.dtype, copy=False).tofile(self._file)
+        self._last_freq = float(trace['freq'][-1])
+        self.size += len(trace)
+
+    def append_file(self, path: Path | str, chunk: int = 1 << 20) -> None:
+        """Appends trace stored by another writer without loading it whole."""
+        data: np.ndarray = load_trace(path)
+        for start in range(0, len(data), chunk):
+            self.append(data[start: start + chunk])
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        meta: dict[str, Any] = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'dtype': self.dtype.descr,
+            'count': self.size,
+            'settings': self.settings,
+        }
+        sidecar_path(self.path).write_text(json.dumps(meta, indent=2))
+
+
+def read_metadata(path: Path | str) -> dict[str, Any]:
+    return json.loads(sidecar_path(Path(path)).read_text())
+
+
+def load_trace(path: Path | str, mmap: bool = True) -> np.ndarray:
+    """Loads trace written by `TraceWriter`. By default the file is memory
+    mapped, so only accessed parts are read from disk."""
+    meta: dict[str, Any] = read_metadata(path)
+    dtype = np.dtype([tuple(field) for field in meta['dtype']])
+    if not meta['count']:
+        return np.empty(0, dtype=dtype)
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode='r', shape=(meta['count'],))
+    return np.fromfile(path, dtype=dtype, count=meta['count'])
+
+
+def export_csv(trace: np.ndarray, csv_path: Path | str,
+               chunk: int = 1 << 20) -> None:
+    """Writes trace as `freq;ampl` CSV lines chunk by chunk."""
+    with Path(csv_path).open('w') as file:
+        for start in range(0, len(trace), chunk):
+            part: np.ndarray = trace[start: start + chunk]
+            np.savetxt(file, np.column_stack((part['freq'], part['ampl'])),
+                       delimiter=';', fmt='%.3f')
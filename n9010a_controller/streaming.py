@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Literal, NamedTuple
+import numpy as np
+from n9010a_controller.trace_decoder import trace_dtype
+
+if TYPE_CHECKING:
+    from n9010a_controller.session import N9010ASession
+
+
+class Frame(NamedTuple):
+    index: int
+    timestamp: float
+    trace: np.ndarray
+
+
+class TraceRingBuffer:
+    """Fixed size history of sweeps (waterfall) stored in one preallocated
+    (depth, points) structured array. Subscribers receive frames through
+    bounded queues: if a reader is slower than acquisition, its oldest
+    pending frame is dropped instead of blocking the producer. Frames are
+    read only views on the buffer rows, so `depth` must be larger than
+    subscriber queue size. `close` ends subscriptions."""
+    def __init__(self, depth: int, points: int = 0,
+                 dtype: np.dtype | None = None) -> None:
+        self.depth: int = depth
+        self.dtype: np.dtype = dtype if dtype is not None else trace_dtype()
+        self.data: np.ndarray = np.zeros((depth, points), dtype=self.dtype)
+        self.timestamps: np.ndarray = np.zeros(depth)
+        self.count: int = 0
+        self.dropped: int = 0
+        # Queues get frames, then None on close or the error which stopped
+        # acquisition.
+        self._subscribers: list[asyncio.Queue[Frame | BaseException | None]] = []
+
+    def __len__(self) -> int:
+        return min(self.count, self.depth)
+
+    def _resize(self, points: int) -> None:
+        self.data = np.zeros((self.depth, points), dtype=self.dtype)
+        self.timestamps[:] = 0
+        self.count = 0
+
+    def push(self, trace: np.ndarray, timestamp: float | None = None) -> Frame:
+        if len(trace) != self.data.shape[1]:
+            self._resize(len(trace))
+        row: int = self.count % self.depth
+        self.data[row] = trace
+        self.timestamps[row] = time.time() if timestamp is None else timestamp
+        view: np.ndarray = self.data[row].view()
+        view.flags.writeable = False
+        frame = Frame(self.count, float(self.timestamps[row]), view)
+        self.count += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(frame)
+        return frame
+
+    def latest(self) -> np.ndarray | None:
+        if not self.count:
+            return None
+        return self.data[(self.count - 1) % self.depth]
+
+    def history(self) -> np.ndarray:
+        """Returns stored sweeps ordered from the oldest to the newest."""
+        if self.count <= self.depth:
+            return self.data[:self.count]
+        row: int = self.count % self.depth
+        return np.concatenate((self.data[row:], self.data[:row]))
+
+    def close(self, error: BaseException | None = None) -> None:
+        """Wakes subscribers: their iterators end, or raise `error` if it
+        is given. The pending frame is dropped if the queue is full."""
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(error)
+
+    async def subscribe(self, maxsize: int = 1) -> AsyncIterator[Frame]:
+        queue: asyncio.Queue[Frame | BaseException | None] = asyncio.Queue(maxsize)
+        self._subscribers.append(queue)
+        try:
+            while True:
+                item: Frame | BaseException | None = await queue.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self._subscribers.remove(queue)
+
+
+class SweepStream:
+    """Continuous acquisition loop pushing sweeps into `TraceRingBuffer`.
+    In `READ` mode every sweep is started by `:READ:SAN?`, in `FETC` mode
+    the analyzer sweeps continuously and the last trace is fetched. If
+    acquisition fails, the error is kept in `error` and raised in
+    subscriber iterators; `stop` ends them."""
+    def __init__(self, session: 'N9010ASession', depth: int = 256,
+                 mode: Literal['READ', 'FETC'] = 'READ') -> None:
+        self.session: 'N9010ASession' = session
+        self.buffer = TraceRingBuffer(depth)
+        self.mode: Literal['READ', 'FETC'] = mode
+        self._task: asyncio.Task | None = None
+        self.error: BaseException | None = None
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def subscribe(self, maxsize: int = 1) -> AsyncIterator[Frame]:
+        return self.buffer.subscribe(maxsize)
+
+    async def start(self) -> None:
+        if self.is_running():
+            return
+        api = self.session.api
+        await self.session.send(api.set_continuous_sweep(self.mode == 'FETC'))
+        await self.session.update_sweep_timeout()
+        self.error = None
+        self._task = asyncio.create_task(self._acquire())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.buffer.close()
+        await self.session.send(self.session.api.set_continuous_sweep(False))
+
+    async def _acquire(self) -> None:
+        try:
+            await self._acquire_loop()
+        except Exception as err:
+            print(f'acquisition stopped: {err!r}')
+            self.error = err
+            self.buffer.close(err)
+
+    async def _acquire_loop(self) -> None:
+        fetch: bool = self.mode == 'FETC'
+        header: str = ':FETC:SAN1?' if fetch else ':READ:SAN1?'
+        while True:
+            request = await self.session.request_sweep(fetch=fetch)
+            try:
+                payload: bytes = await self.session.receive_sweep(request)
+            except TimeoutError:
+                print('timeout')
+                continue
+            self.buffer.push(self.session.decode(payload, header))
@@ -1,13 +1,27 @@
 import os
+import sys
 from pathlib import Path
 from n9010a_controller import __version__
 
 
-def pyinstaller() -> None:
+def compile_ui() -> None:
+    """Generates `_n9010a_ui.py` from `N9010A.ui`, so the application
+    doesn't parse XML form on every start."""
+    client_path: Path = Path(__file__).parent / 'pyqt_client'
+    ui_path: Path = client_path / 'N9010A.ui'
+    module_path: Path = client_path / '_n9010a_ui.py'
+    os.system(f'"{sys.executable}" -m PyQt6.uic.pyuic "{ui_path}" -o "{module_path}"')
+
+
+def pyinstaller(onefile: bool = True) -> None:
     # icon: str = f"--icon {cwd().joinpath('assets', 'settings.ico')}"
+    compile_ui()
+    # --onedir build starts faster: nothing is unpacked to a temp folder.
     flags: list[str] = [f"--name SpectrumAnalizer_v{__version__}",
-                        "--console", "--onefile", "--clean", "--noconfirm"]
+                        "--console", "--onefile" if onefile else "--onedir",
+                        "--clean", "--noconfirm"]
     main_path: str = str(Path(__file__).parent / 'pyqt_client' /'backend.py')
+    # .ui file is kept as a fallback for an outdated generated module.
     ui_paths: list[str] = ['--add-data ' + str(f"\"{file};.\"")
                            for file in (Path(__file__).parent / 'pyqt_client').glob("*.ui")]
 
@@ -23,4 +37,4 @@ def pyinstaller() -> None:
 
 
 if __name__ == '__main__':
-    pyinstaller()
\ No newline at end of file
+    pyinstaller('--onedir' not in sys.argv)
@@ -0,0 +1,30 @@
+from typing import Literal
+import numpy as np
+
+
+TraceFormat = Literal['REAL,32', 'REAL,64', 'INT,32']
+
+_SAMPLE_TYPES: dict[str, str] = {
+    'REAL,32': '>f4',
+    'REAL,64': '>f8',
+    'INT,32': '>i4',
+}
+
+
+def trace_dtype(fmt: TraceFormat = 'REAL,32') -> np.dtype:
+    """Structured dtype of one (freq, ampl) pair of `:READ:SAN?` answer
+    in the given `:FORM` data format (big endian, `:FORM:BORD NORM`)."""
+    sample: str = _SAMPLE_TYPES[fmt]
+    return np.dtype([('freq', sample), ('ampl', sample)])
+
+
+def decode_trace(payload: bytes | bytearray | memoryview,
+                 fmt: TraceFormat = 'REAL,32') -> np.ndarray:
+    """Decodes the payload of `:READ:SAN?` block into structured array
+    with `freq` and `ampl` fields. Returned array is a view on the payload
+    buffer, so no samples are copied. Incomplete trailing pair is ignored."""
+    dtype: np.dtype = trace_dtype(fmt)
+    view = memoryview(payload).cast('B')
+    usable: int = len(view) - len(view) % dtype.itemsize
+    return np.frombuffer(view[:usable], dtype=dtype)
+
@@ -0,0 +1,248 @@
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING, BinaryIO, Literal
+from n9010a_controller.metrics import CommandMetrics, message_header
+
+if TYPE_CHECKING:
+    from python_tcp.aio.client import SocketClient
+
+
+async def read_block(reader: asyncio.StreamReader,
+                     timeout: float | None = None,
+                     terminated: bool = True, prefix: bytes = b'') -> bytes:
+    """Reads one IEEE 488.2 block response (e.g. answer on `:READ:SAN?`
+    with `:FORM REAL,32`) from the stream. Timeout is applied only to the
+    block header, payload is read with `readexactly` so pauses of the
+    instrument in the middle of transfer don't cut the trace off. `prefix`
+    is the already consumed beginning of the block."""
+    head: bytes = prefix + await asyncio.wait_for(
+        reader.readexactly(2 - len(prefix)), timeout)
+    if head[:1] != b'#':
+        raise ValueError(f'Invalid block header: {head!r}')
+    digits: int = int(head[1:2])
+    if digits == 0:
+        payload: bytes = await reader.readuntil(b'\n')
+        return payload[:-1]
+    length: int = int(await reader.readexactly(digits))
+    payload = await reader.readexactly(length)
+    if terminated:
+        await reader.readuntil(b'\n')
+    return payload
+
+
+async def copy_block(reader: asyncio.StreamReader, sink: BinaryIO,
+                     timeout: float | None = None, terminated: bool = True,
+                     prefix: bytes = b'', chunk: int = 1 << 16) -> int:
+    """Like `read_block`, but writes the payload to `sink` by chunks, so
+    large files (e.g. `:MMEM:DATA?`) are never held in memory as a whole.
+    `timeout` is applied to the header and to every chunk separately, so a
+    slow transfer goes on while a stalled one fails. Returns payload
+    length."""
+    head: bytes = prefix + await asyncio.wait_for(
+        reader.readexactly(2 - len(prefix)), timeout)
+    if head[:1] != b'#' or head[1:2] == b'0':
+        raise ValueError(f'Invalid block header: {head!r}')
+    length: int = int(await reader.readexactly(int(head[1:2])))
+    left: int = length
+    while left:
+        data: bytes = await asyncio.wait_for(reader.readexactly(min(chunk, left)),
+                                             timeout)
+        sink.write(data)
+        left -= len(data)
+    if terminated:
+        await reader.readuntil(b'\n')
+    return length
+
+
+ReplyKind = Literal['line', 'block', 'none']
+# Reply kind, its future, metrics key, time the query was written,
+# optional file the block reply is copied to and timeout of the reply start.
+_Pending = tuple[ReplyKind, asyncio.Future[bytes], str, float, BinaryIO | None,
+                 float | None]
+
+
+class CommandChannel:
+    """Single owner of the instrument input stream. Every query registers
+    the kind of expected reply (`line` terminated by `\\n` or IEEE 488.2
+    `block`) in FIFO order together with its write, and one reader task
+    resolves replies in that order. So concurrent coroutines can pipeline
+    queries without stealing each other's replies. After a reply timeout
+    the channel is resynchronized: pending queries fail and unread input
+    is flushed. If `metrics` is set, write, time to first reply byte and
+    transfer time are recorded per command header."""
+    def __init__(self, device: 'SocketClient',
+                 metrics: CommandMetrics | None = None) -> None:
+        self.device: 'SocketClient' = device
+        self.metrics: CommandMetrics | None = metrics
+        self._pending: deque[_Pending] = deque()
+        self._has_pending = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._reader_task: asyncio.Task | None = None
+
+    def _ensure_reader(self) -> None:
+        if self._reader_task is None or self._reader_task.done():
+            self._reader_task = asyncio.create_task(self._read_replies())
+
+    async def _read_reply(self, kind: ReplyKind, sink: BinaryIO | None,
+                          timeout: float | None) -> bytes:
+        if kind == 'block' and sink is not None:
+            await copy_block(self.device.reader, sink, timeout)
+            return b''
+        if kind == 'block':
+            return await read_block(self.device.reader, timeout)
+        return (await asyncio.wait_for(self.device.reader.readuntil(b'\n'),
+                                       timeout))[:-1]
+
+    async def _read_traced_reply(self, kind: ReplyKind, header: str,
+                                 sent: float, ready: float,
+                                 sink: BinaryIO | None,
+                                 timeout: float | None) -> bytes:
+        """Reads the first byte separately to split reply latency into time
+        to first byte (from the write or the end of the previous reply) and
+        transfer time."""
+        first: bytes = await asyncio.wait_for(self.device.reader.readexactly(1),
+                                              timeout)
+        received: float = time.perf_counter()
+        size: int = 0
+        if kind == 'block' and sink is not None:
+            size = await copy_block(self.device.reader, sink, timeout,
+                                    prefix=first)
+            reply: bytes = b''
+        elif kind == 'block':
+            reply = await read_block(self.device.reader, prefix=first)
+        elif first == b'\n':
+            reply = b''
+        else:
+            reply = first + (await self.device.reader.readuntil(b'\n'))[:-1]
+        if self.metrics is not None:
+            self.metrics.record_reply(header, size + len(reply) + 1,
+                                      received - max(sent, ready),
+                                      time.perf_counter() - received)
+        return reply
+
+    async def _read_replies(self) -> None:
+        ready: float = time.perf_counter()
+        while True:
+            if not self._pending:
+                self._has_pending.clear()
+                await self._has_pending.wait()
+                ready = time.perf_counter()
+                continue
+            kind, future, header, sent, sink, timeout = self._pending[0]
+            try:
+                if self.metrics is None:
+                    reply: bytes = await self._read_reply(kind, sink, timeout)
+                else:
+                    reply = await self._read_traced_reply(kind, header, sent,
+                                                          ready, sink, timeout)
+            except ConnectionError as err:
+                self._fail_pending(err)
+                continue
+            except Exception as err:
+                # Timeout, broken block header, line over the stream limit or
+                # failed write to the sink: rest of the reply would be parsed
+                # as the reply of the next query, so the channel is resynced.
+                if isinstance(err, asyncio.TimeoutError):
+                    err = TimeoutError('Reply was not received')
+                async with self._write_lock:
+                    if self._pending and self._pending[0][1] is future:
+                        self._fail_pending(err, 1)
+                    self._fail_pending(TimeoutError('Reply was discarded by resync'))
+                    await self._drain()
+                ready = time.perf_counter()
+                continue
+            ready = time.perf_counter()
+            # Entry could be already failed by `resync`.
+            if self._pending and self._pending[0][1] is future:
+                self._pending.popleft()
+            if not future.done():
+                future.set_result(reply)
+
+    def _fail_pending(self, err: BaseException, limit: int | None = None) -> None:
+        count: int = 0
+        while self._pending and (limit is None or count < limit):
+            _, future, header, _, _, _ = self._pending.popleft()
+            count += 1
+            if self.metrics is not None:
+                self.metrics.record_error(header)
+            if not future.done():
+                future.set_exception(err)
+
+    async def send(self, cmd: bytes, kind: ReplyKind = 'none',
+                   sink: BinaryIO | None = None,
+                   start_timeout: float | None = None) -> asyncio.Future[bytes]:
+        """Writes the message and returns future of its reply. Future of
+        the message without reply is resolved immediately. If `sink` is
+        given, block reply is copied to it and future resolves with empty
+        bytes. `start_timeout` limits waiting for the reply to start once
+        the previous replies are read (and for every chunk copied to
+        `sink`), the rest of the reply is read without a deadline; on expiry
+        the channel is resynchronized. The future is always resolved: a
+        failed read or write to `sink` fails it."""
+        future: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+        header: str = message_header(cmd) if self.metrics is not None else ''
+        async with self._write_lock:
+            started: float = time.perf_counter()
+            if kind == 'none':
+                future.set_result(b'')
+            else:
+                self._ensure_reader()
+                self._pending.append((kind, future, header, started, sink,
+                                      start_timeout))
+                self._has_pending.set()
+            await self.device.send(cmd)
+            if self.metrics is not None:
+                self.metrics.record_write(header, len(cmd),
+                                          time.perf_counter() - started)
+        return future
+
+    async def wait(self, future: asyncio.Future[bytes],
+                   timeout: float | None = None) -> bytes:
+        """Raises builtin `TimeoutError` (`asyncio.TimeoutError` differs
+        from it before Python 3.11) after resynchronization."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError as err:
+            await self.resync()
+            raise TimeoutError('Reply was not received') from err
+
+    async def query(self, cmd: bytes, kind: ReplyKind = 'line',
+                    timeout: float | None = None) -> bytes:
+        return await self.wait(await self.send(cmd, kind), timeout)
+
+    def _cancel_reader(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+    async def flush(self, idle: float = 0.1) -> bytes:
+        """Reads and returns unsolicited input while no reply is expected."""
+        async with self._write_lock:
+            if self._pending:
+                return b''
+            self._cancel_reader()
+            return await self._drain(idle)
+
+    async def _drain(self, idle: float = 0.1) -> bytes:
+        """Reads input until nothing arrives for `idle` seconds."""
+        data: bytes = b''
+        while True:
+            try:
+                data += await asyncio.wait_for(self.device.reader.read(4096), idle)
+            except asyncio.TimeoutError:
+                return data
+            if self.device.reader.at_eof():
+                return data
+
+    async def resync(self) -> None:
+        """Fails pending queries, stops the reader in the middle of a reply
+        and drains input before any new message is written."""
+        async with self._write_lock:
+            self._fail_pending(TimeoutError('Reply was not received'))
+            self._cancel_reader()
+            await self._drain()
+
+    async def close(self) -> None:
+        self._fail_pending(ConnectionError('Channel is closed'))
+        self._cancel_reader()
@@ -0,0 +1,74 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+import numpy as np
+from n9010a_controller.batch import CommandBatch
+from n9010a_controller.scpi_parser import parse_scalar
+from n9010a_controller.session import N9010ASession
+from n9010a_controller.simulator import SimulatedN9010A
+from n9010a_controller.stitching import StitchingEngine
+from n9010a_controller.storage import TraceWriter, read_metadata, sidecar_path
+
+
+@asynccontextmanager
+async def simulated_session() -> AsyncIterator[N9010ASession]:
+    simulator = SimulatedN9010A()
+    port: int = await simulator.start()
+    try:
+        async with N9010ASession('127.0.0.1', port) as session:
+            yield session
+    finally:
+        await simulator.stop()
+
+
+def test_sweep_and_peaks() -> None:
+    async def run() -> tuple[np.ndarray, np.ndarray]:
+        async with simulated_session() as session:
+            await session.configure(points=1001)
+            return await session.sweep(), await session.peaks(-60, 3)
+
+    trace, peaks = asyncio.run(run())
+    assert len(trace) == 1001
+    assert trace['freq'][0] == 1e9 and trace['freq'][-1] == 2e9
+    assert trace['freq'][np.argmax(trace['ampl'])] == 1.5e9
+    assert abs(float(trace['ampl'].max()) + 20) < 3
+    assert len(peaks)
+    assert abs(peaks[0, 1] - 1.5e9) <= 1e6
+
+
+def test_two_session_stitch_to_file(tmp_path: Path) -> None:
+    path: Path = tmp_path / 'scan.bin'
+    step: int = 10_000_000
+
+    async def run() -> np.ndarray:
+        async with simulated_session() as first, simulated_session() as second:
+            for session in (first, second):
+                await session.configure(points=101)
+            result = await StitchingEngine([first, second]).run(
+                int(1e9), int(1e9) + 4 * step, step, points=101,
+                writer=TraceWriter(path))
+            return np.array(result)
+
+    trace: np.ndarray = asyncio.run(run())
+    assert trace['freq'][0] == 1e9 and trace['freq'][-1] == 1e9 + 4 * step
+    assert np.all(np.diff(trace['freq']) > 0)
+    assert read_metadata(path)['count'] == len(trace)
+    assert sorted(file.name for file in tmp_path.iterdir()) == \
+        sorted([path.name, sidecar_path(path).name])
+
+
+def test_batch_readback() -> None:
+    async def run() -> tuple[list[bytes], list[bytes]]:
+        async with simulated_session() as session:
+            api = session.api
+            before = await session.execute(CommandBatch(api.get_freq_span(),
+                                                        api.get_points_amount()))
+            after = await session.execute(CommandBatch(api.set_start_freq(1_500_000_000),
+                                                       api.get_freq_span()))
+            return before, after
+
+    before, after = asyncio.run(run())
+    assert parse_scalar(before[0]) == 1e9
+    assert parse_scalar(before[1]) == 1001
+    assert parse_scalar(after[0]) == 5e8